@@ -0,0 +1,213 @@
+import sys, os, time, signal
+import argparse
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from datetime import datetime
+from solver import *
+
+try:
+    import resource  # memory cap, not available on Windows
+except ImportError:
+    resource = None
+
+# default limits per (level, method) job
+job_timeout = 300      # giây
+job_memory = 4096      # MB
+
+# methods in budget_methods stop themselves at the timeout and report their
+# stats; the process is only killed kill_grace seconds later
+kill_grace = 5         # giây
+
+# search stop_reason -> job status
+stop_status = {'time': 'timeout', 'memory': 'memory', 'nodes': 'node_limit', 'cancelled': 'cancelled'}
+
+def parse_levels(text):
+    # "1-10,15,20-22" -> [1, ..., 10, 15, 20, 21, 22]
+    levels = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            levels += range(int(first), int(last) + 1)
+        elif part:
+            levels.append(int(part))
+    return levels
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def kill_job(process):
+    # the job and every process it started, see run_job
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # no process groups (Windows), or killed before setpgrp ran
+        process.terminate()
+
+def run_job(conn, testcase, method, memory_mb, is_log, timeout=None, progress=False, use_cache=True):
+    # worker process: solve one level with one method, send a summary back
+    # messages: ('progress', event) while searching, then ('done', summary)
+    if hasattr(os, 'setpgrp'):
+        # own process group: a timeout also kills the processes started by
+        # HDA_star or portfolio (see kill_job)
+        os.setpgrp()
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    # solver prints the map, the log name, ...: keep the batch output readable
+    sys.stdout = open(os.devnull, 'w')
+    options = {}
+    if method in budget_methods:
+        options['budget'] = {'time': timeout}
+        if progress:
+            options['progress'] = lambda event: conn.send(('progress', event))
+    try:
+        solved = solve_testcase(testcase, method, is_log, use_cache, **options)
+        if solved is None:
+            summary = {'status': 'error', 'error': 'no testcase'}
+        else:
+            result = solved[1]
+            if result['is_solved']:
+                status = 'solved'
+            elif 'stop_reason' in result:
+                status = stop_status[result['stop_reason']]
+            else:
+                status = 'no_solution'
+            summary = {
+                'status': status,
+                'steps': len(result['path']),
+                'expand_node': result['expand_node'],
+                'generated_node': result['generated_node'],
+                'revisited_node': result['revisited_node'],
+                'time_taken': result['time_taken'],
+                'memory_used': result['memory_used'],
+                'cached': result.get('cached', False)
+            }
+    except MemoryError:
+        summary = {'status': 'memory'}
+    except Exception as e:
+        summary = {'status': 'error', 'error': repr(e)}
+    conn.send(('done', summary))
+    conn.close()
+
+def run_batch(levels, methods, jobs=None, timeout=job_timeout, memory_mb=job_memory, is_log=True,
+              progress=False, use_cache=True, collection=None):
+    """
+    Solve every (level, method) pair in its own process, at most `jobs` at a
+    time (default: number of available cores)
+
+    A job running longer than `timeout` seconds is stopped (killed if the
+    method can't stop itself), a job going over `memory_mb` MB fails with
+    MemoryError; either way the other jobs keep running. With `progress`,
+    the progress events of the jobs are printed as they come. Levels already
+    in the solution cache are answered from it (stats of the cached run).
+    With `collection` (a .xsb/.sok file), levels are numbers in that file.
+    Returns one summary dict per job, in (level, method) order.
+    """
+    jobs = jobs or available_cores()
+    pending = [(tc, method) for tc in levels for method in methods]
+    running = {}  # conn -> (job, process, start_time)
+    summaries = {}
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            job = pending.pop(0)
+            parent_conn, child_conn = mp.Pipe(duplex=False)
+            testcase = f"{collection}:{job[0]}" if collection else job[0]
+            process = mp.Process(target=run_job, args=(child_conn, testcase, job[1], memory_mb, is_log,
+                                                       timeout, progress, use_cache))
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (job, process, time.time())
+            print(f"[start] level {job[0]} {job[1]}")
+
+        for conn in wait(list(running), timeout=0.5):
+            job, process, start_time = running[conn]
+            try:
+                kind, message = conn.recv()
+            except EOFError:
+                # died without answering (killed by the OS, segfault, ...)
+                kind, message = 'done', {'status': 'crashed'}
+            if kind == 'progress':
+                print(f"[progress] level {job[0]} {job[1]}: {format_progress(message)}")
+                continue
+            running.pop(conn)
+            summary = message
+            process.join()
+            if summary['status'] == 'crashed' and process.exitcode:
+                summary['error'] = f"exit code {process.exitcode}"
+            summary['wall_time'] = time.time() - start_time
+            summaries[job] = summary
+            print(f"[{summary['status']}] level {job[0]} {job[1]} ({summary['wall_time']:.1f}s)")
+
+        now = time.time()
+        for conn, (job, process, start_time) in list(running.items()):
+            if now - start_time > timeout + (kill_grace if job[1] in budget_methods else 0):
+                kill_job(process)
+                process.join()
+                running.pop(conn)
+                summaries[job] = {'status': 'timeout', 'wall_time': now - start_time}
+                print(f"[timeout] level {job[0]} {job[1]}")
+
+    return [dict(level=tc, method=method, **summaries[(tc, method)])
+            for tc in levels for method in methods]
+
+def write_summary(summaries, timeout, memory_mb):
+    # one table for the whole batch, next to the per-level logs
+    os.makedirs("logs", exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"logs/batch_{timestamp}.txt"
+    lines = []
+    lines.append("=" * 80)
+    lines.append("SOKOBAN SOLVER - BATCH SUMMARY")
+    lines.append("=" * 80)
+    lines.append(f"Thời gian: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    lines.append(f"Giới hạn mỗi job: {timeout}s, {memory_mb} MB")
+    lines.append("-" * 80)
+    lines.append(f"{'Level':>5}  {'Method':<14}{'Status':<12}{'Steps':>7}{'Expanded':>12}{'Time (s)':>11}{'Mem (MB)':>10}")
+    for s in summaries:
+        if 'expand_node' in s:
+            lines.append(f"{s['level']:>5}  {s['method']:<14}{s['status']:<12}{s['steps']:>7}"
+                         f"{s['expand_node']:>12,}{s['time_taken']:>11.3f}{s['memory_used']:>10.3f}"
+                         f"{'  (cache)' if s.get('cached') else ''}")
+        else:
+            lines.append(f"{s['level']:>5}  {s['method']:<14}{s['status']:<12}{'-':>7}{'-':>12}"
+                         f"{s['wall_time']:>11.3f}{'-':>10}  {s.get('error', '')}")
+    lines.append("-" * 80)
+    methods = list(dict.fromkeys(s['method'] for s in summaries))
+    for method in methods:
+        rows = [s for s in summaries if s['method'] == method]
+        solved = [s for s in rows if s['status'] == 'solved']
+        total_time = sum(s['time_taken'] for s in solved)
+        lines.append(f"{method}: giải được {len(solved)}/{len(rows)} level, tổng thời gian {total_time:.3f}s")
+    lines.append("=" * 80)
+
+    text = "\n".join(lines) + "\n"
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(text)
+    print(f"Đã tạo tổng hợp: {filename}")
+    return filename
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many levels in parallel")
+    parser.add_argument('--levels', default=None, help="e.g. 1-10,15 (default 1-40, all levels of --collection)")
+    parser.add_argument('--collection', default=None, help=".xsb/.sok file holding the levels")
+    parser.add_argument('--methods', nargs='+', default=['BrFS', 'A_star'], choices=list(search_methods))
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: cores)")
+    parser.add_argument('--timeout', type=float, default=job_timeout, help="seconds per job")
+    parser.add_argument('--memory', type=int, default=job_memory, help="MB per job")
+    parser.add_argument('--no-log', action='store_true', help="don't write per-level logs")
+    parser.add_argument('--progress', action='store_true', help="print the progress of running jobs")
+    parser.add_argument('--no-cache', action='store_true', help="solve again even if cached")
+    args = parser.parse_args()
+
+    if args.collection:
+        count = len(open_collection(args.collection))
+        levels = parse_levels(args.levels) if args.levels else list(range(1, count + 1))
+    else:
+        levels = parse_levels(args.levels or '1-40')
+    summaries = run_batch(levels, args.methods, args.jobs, args.timeout, args.memory,
+                          not args.no_log, args.progress, not args.no_cache, args.collection)
+    write_summary(summaries, args.timeout, args.memory)
@@ -0,0 +1,226 @@
+import sys, os, re
+import argparse
+import csv
+import json
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from solver import *
+import instrument
+from batch import parse_levels
+
+# python benchmark.py run --levels 1-10 --methods BrFS A_star --repeat 3
+# python benchmark.py compare benchmarks/run.json benchmarks/baseline.json
+# python benchmark.py import-logs --out benchmarks/history.json
+
+# columns of the JSON records and of the CSV file
+fields = ['level', 'method', 'solved', 'steps', 'expand_node', 'generated_node', 'revisited_node',
+          'time_taken', 'time_min', 'memory_used', 'memory_measure', 'nodes_per_sec', 'date']
+
+# relative increase over the baseline reported as a regression
+regression_threshold = 0.20
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(levels, methods, repeat=3):
+    """
+    Solve every (level, method) `repeat` times in this process
+
+    Node counts and memory come from the last run (the searches are
+    deterministic), time_taken is the median and time_min the fastest run.
+    """
+    records = []
+    for tc in levels:
+        init_map = load_testcase(tc)
+        if not init_map:
+            continue
+        for method in methods:
+            times = []
+            for _ in range(repeat):
+                init_state = make_init_state(init_map)
+                result = search_methods[method](init_state, init_state.goal)
+                times.append(result['time_taken'])
+            time_taken = statistics.median(times)
+            records.append({
+                'level': tc,
+                'method': method,
+                'solved': result['is_solved'],
+                'steps': len(result['path']),
+                'expand_node': result['expand_node'],
+                'generated_node': result['generated_node'],
+                'revisited_node': result['revisited_node'],
+                'time_taken': time_taken,
+                'time_min': min(times),
+                'memory_used': result['memory_used'],
+                'memory_measure': result.get('memory_measure', 'tracemalloc'),
+                'nodes_per_sec': result['expand_node'] / time_taken if time_taken > 0 else 0.0,
+                'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+            print(f"level {tc} {method}: {len(result['path'])} steps, "
+                  f"{result['expand_node']:,} expanded, {time_taken:.3f}s, {result['memory_used']:.3f} MB")
+    return records
+
+def save_records(records, json_path, csv_path=None, meta=None):
+    os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta or {}, 'results': records}, f, indent=2, ensure_ascii=False)
+    print(f"Saved {json_path}")
+    if csv_path:
+        os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(records)
+        print(f"Saved {csv_path}")
+
+def load_records(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+def latest_by_key(records):
+    # (level, method) -> newest record, history files hold several runs
+    latest = {}
+    for record in sorted(records, key=lambda r: r.get('date') or ''):
+        latest[(record['level'], record['method'])] = record
+    return latest
+
+def compare_records(current, baseline, threshold=regression_threshold):
+    """
+    Compare two sets of records on time, expanded nodes, memory and steps
+
+    Returns the list of regressions, each (level, method, metric, baseline
+    value, current value); a metric regresses when it grew by more than
+    `threshold` (relative), steps whenever the solution got longer. Memory
+    is only compared when both records use the same memory_measure.
+    """
+    current = latest_by_key(current)
+    baseline = latest_by_key(baseline)
+    regressions = []
+    print(f"{'Level':>5}  {'Method':<14}{'Time (s)':>20}{'Expanded':>24}{'Mem (MB)':>20}")
+    for key in sorted(current.keys() & baseline.keys()):
+        new, old = current[key], baseline[key]
+        if not (new['solved'] and old['solved']):
+            if old['solved'] and not new['solved']:
+                regressions.append((*key, 'solved', True, False))
+            continue
+        row = f"{key[0]:>5}  {key[1]:<14}"
+        for metric in ('time_taken', 'expand_node', 'memory_used'):
+            before, after = old[metric], new[metric]
+            if metric == 'memory_used' and (old.get('memory_measure', 'tracemalloc')
+                                            != new.get('memory_measure', 'tracemalloc')):
+                # RSS growth against a tracemalloc peak: not comparable
+                row += f"{'-':>10} {'':>8} "
+                continue
+            change = (after - before) / before if before else 0.0
+            value = f"{before:,}" if metric == 'expand_node' else f"{before:.3f}"
+            row += f"{value:>10} {change:>+8.1%} "
+            if change > threshold:
+                regressions.append((*key, metric, before, after))
+        if new['steps'] > old['steps']:
+            regressions.append((*key, 'steps', old['steps'], new['steps']))
+        print(row)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {threshold:.0%}:")
+        for level, method, metric, before, after in regressions:
+            print(f"  level {level} {method}: {metric} {before} -> {after}")
+    else:
+        print(f"\nNo regression above {threshold:.0%}")
+    return regressions
+
+def parse_log(path):
+    # one record from a create_log file, None if it isn't one
+    match = re.match(r'([^_]+)_(.+)_(\d{8}_\d{6})\.txt$', os.path.basename(path))
+    if not match:
+        return None
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if 'DETAILED ANALYSIS' not in text:
+        return None
+
+    def number(label):
+        found = re.search(label + r':\s*([\d,.]+)', text)
+        return float(found.group(1).replace(',', '')) if found else None
+
+    date = re.search(r'Thời gian:\s*(.+)', text)
+    steps = number('Số bước')
+    expand_node = number('Nodes đã mở rộng') or 0
+    time_taken = number('Thời gian thực hiện') or 0.0
+    return {
+        'level': int(match.group(1)) if match.group(1).isdigit() else match.group(1),
+        'method': match.group(2),
+        'solved': 'TÌM THẤY LỜI GIẢI' in text,
+        'steps': int(steps) if steps is not None else 0,
+        'expand_node': int(expand_node),
+        'generated_node': int(number('Nodes đã tạo') or 0),
+        'revisited_node': int(number('Nodes truy cập lại') or 0),
+        'time_taken': time_taken,
+        'time_min': time_taken,
+        'memory_used': number(r'Memory sử dụng(?: \(RSS\))?') or 0.0,
+        'memory_measure': 'rss' if 'Memory sử dụng (RSS)' in text else 'tracemalloc',
+        'nodes_per_sec': expand_node / time_taken if time_taken > 0 else 0.0,
+        'date': date.group(1).strip() if date else None
+    }
+
+def import_logs(log_dir="logs"):
+    records = []
+    for name in sorted(os.listdir(log_dir)):
+        record = parse_log(os.path.join(log_dir, name))
+        if record is not None:
+            records.append(record)
+    print(f"Imported {len(records)} log(s) from {log_dir}")
+    return records
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the solver and compare runs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="run levels x methods, save JSON/CSV")
+    run.add_argument('--levels', default='1-10', help="e.g. 1-10,15")
+    run.add_argument('--methods', nargs='+', default=['BrFS', 'A_star'], choices=list(search_methods))
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--out', default=None, help="JSON file (default benchmarks/<timestamp>.json)")
+    run.add_argument('--csv', default=None, help="also write a CSV file")
+    run.add_argument('--baseline', default=None, help="JSON file to compare against")
+    run.add_argument('--threshold', type=float, default=regression_threshold)
+    run.add_argument('--tracemalloc', action='store_true', help="exact memory (slower searches)")
+
+    compare = commands.add_parser('compare', help="compare two JSON files")
+    compare.add_argument('current')
+    compare.add_argument('baseline')
+    compare.add_argument('--threshold', type=float, default=regression_threshold)
+
+    history = commands.add_parser('import-logs', help="turn logs/*.txt into a JSON history")
+    history.add_argument('--logs', default='logs')
+    history.add_argument('--out', default='benchmarks/history.json')
+    history.add_argument('--csv', default=None)
+
+    args = parser.parse_args()
+    regressions = []
+    if args.command == 'run':
+        instrument.trace_memory = args.tracemalloc
+        records = run_benchmark(parse_levels(args.levels), args.methods, args.repeat)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        meta = {
+            'date': timestamp,
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'repeat': args.repeat,
+            'tracemalloc': args.tracemalloc
+        }
+        save_records(records, args.out or f"benchmarks/{timestamp}.json", args.csv, meta)
+        if args.baseline:
+            regressions = compare_records(records, load_records(args.baseline), args.threshold)
+    elif args.command == 'compare':
+        regressions = compare_records(load_records(args.current), load_records(args.baseline), args.threshold)
+    elif args.command == 'import-logs':
+        save_records(import_logs(args.logs), args.out, args.csv, {'source': args.logs})
+
+    sys.exit(1 if regressions else 0)
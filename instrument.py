@@ -0,0 +1,160 @@
+import gc, os, time
+import tracemalloc
+from time import perf_counter
+
+try:
+    import resource  # peak RSS fallback, not available on Windows
+except ImportError:
+    resource = None
+
+# switches, set by solver.py --profile / --tracemalloc or by hand before a run
+# phase_timing - time every phase of the search loops (small overhead)
+# trace_memory - measure memory with tracemalloc (exact, but slows allocation
+#                down a lot and distorts the reported time); off, memory_used
+#                is the growth of the sampled resident set size
+phase_timing = False
+trace_memory = False
+
+# expansions between two checkpoints (RSS sample, budgets, cancel token,
+# progress event), see SearchProfiler.checkpoint
+check_interval = 1024
+
+# seconds between two progress events
+progress_interval = 1.0
+
+# phases timed when phase_timing is on
+phases = ['move', 'render_map', 'is_deadlock', 'visited', 'heuristic']
+
+# profiler of the search running in this process (None between searches)
+current = None
+
+def rss_mb():
+    # current resident set size in MB
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # no /proc: only the process peak is known (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+    return 0.0
+
+class SearchProfiler:
+    """
+    Time, memory and per-phase counters of one search
+
+    start() before the search, finish() after it; finish returns the
+    'time_taken', 'memory_used' and 'memory_measure' entries of the result
+    dict, plus 'phase_times', 'phase_counts' and 'peak_rss' when phase
+    timing is on. memory_used is the tracemalloc peak when trace_memory is
+    on ('tracemalloc'), otherwise the growth of the resident set size,
+    sampled at every checkpoint and at finish ('rss').
+
+    In the search loops, phases are timed with
+        if timing: t = profiler.lap('move', t)
+    so nothing is measured when phase_timing is off.
+
+    progress: callable(event), called at most every progress_interval
+        seconds with a dict of expand_node, generated_node, frontier,
+        best_f, nodes_per_sec, time and memory (MB)
+    budget: {'nodes': ..., 'time': seconds, 'memory': MB}, any subset
+    cancel: object with is_set() (threading.Event, multiprocessing.Event)
+    """
+    def __init__(self, timing=None, memory=None, progress=None, budget=None, cancel=None):
+        self.timing = phase_timing if timing is None else timing
+        self.trace_memory = trace_memory if memory is None else memory
+        self.progress = progress
+        self.budget = budget or {}
+        self.cancel = cancel
+        self.next_progress = 0.0
+        self.times = dict.fromkeys(phases, 0.0)
+        self.counts = dict.fromkeys(phases, 0)
+        self.start_time = 0.0
+        self.rss_start = 0.0
+        self.rss_peak = 0.0
+
+    def start(self):
+        global current
+        gc.collect()
+        gc.collect()
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        self.rss_start = self.rss_peak = rss_mb()
+        current = self
+        self.start_time = time.time()
+        self.next_progress = self.start_time + progress_interval
+
+    def lap(self, phase, t):
+        # add the time since t to phase, return the new reference time
+        now = perf_counter()
+        self.times[phase] += now - t
+        self.counts[phase] += 1
+        return now
+
+    def sample(self):
+        # record the resident set size
+        rss = rss_mb()
+        if rss > self.rss_peak:
+            self.rss_peak = rss
+
+    def memory(self):
+        # memory used so far in MB, same measure as memory_used
+        if self.trace_memory:
+            return tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+        return self.rss_peak - self.rss_start
+
+    def checkpoint(self, expand_node, generated_node, frontier, best_f=None):
+        """
+        Call every check_interval expansions: samples the RSS, sends the
+        progress event when one is due and returns why the search must stop
+        ('cancelled', 'nodes', 'time' or 'memory'), None to go on
+        """
+        self.sample()
+        now = time.time()
+        elapsed = now - self.start_time
+        if self.progress is not None and now >= self.next_progress:
+            self.next_progress = now + progress_interval
+            self.progress({
+                'expand_node': expand_node,
+                'generated_node': generated_node,
+                'frontier': frontier,
+                'best_f': best_f,
+                'nodes_per_sec': expand_node / elapsed if elapsed > 0 else 0.0,
+                'time': elapsed,
+                'memory': self.memory()
+            })
+        if self.cancel is not None and self.cancel.is_set():
+            return 'cancelled'
+        budget = self.budget
+        if budget.get('nodes') and expand_node >= budget['nodes']:
+            return 'nodes'
+        if budget.get('time') and elapsed >= budget['time']:
+            return 'time'
+        if budget.get('memory') and self.memory() >= budget['memory']:
+            return 'memory'
+        return None
+
+    def finish(self):
+        global current
+        end_time = time.time()
+        self.sample()
+        if self.trace_memory:
+            current_memory, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory_used = peak / (1024 * 1024)
+        else:
+            memory_used = self.rss_peak - self.rss_start
+        current = None
+        stats = {
+            'time_taken': end_time - self.start_time,
+            'memory_used': memory_used,
+            'memory_measure': 'tracemalloc' if self.trace_memory else 'rss'
+        }
+        if self.timing:
+            stats['phase_times'] = dict(self.times)
+            stats['phase_counts'] = dict(self.counts)
+            stats['peak_rss'] = self.rss_peak
+        return stats
@@ -0,0 +1,146 @@
+import os
+import json
+
+# standard Sokoban characters (.xsb / .sok) -> characters of testcases/level*.txt
+# (tile_char in solver.py); floor outside the walls stays a space
+standard_char = {
+    '#': '#',
+    ' ': '.',
+    '-': '.',
+    '_': '.',
+    '.': '?',
+    '$': 'x',
+    '*': '+',
+    '@': '@',
+    '+': '-'
+}
+
+# saved next to the collection: <file>.idx
+index_suffix = '.idx'
+
+def is_map_line(line):
+    # a row of a level: only board characters and at least one wall
+    return '#' in line and all(c in standard_char for c in line)
+
+# floor characters of the standard format
+floor_chars = ' -_'
+
+def inside_cells(rows):
+    # cells inside the outer walls: flooded from the player, boxes and goals
+    # through everything that isn't a wall
+    stack = [(x, y) for y, row in enumerate(rows) for x, c in enumerate(row)
+             if c not in floor_chars and c != '#']
+    inside = set(stack)
+    while stack:
+        x, y = stack.pop()
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if (0 <= ny < len(rows) and 0 <= nx < len(rows[ny]) and rows[ny][nx] != '#'
+                    and (nx, ny) not in inside):
+                inside.add((nx, ny))
+                stack.append((nx, ny))
+    return inside
+
+def convert_map(rows):
+    # standard rows -> repo rows; floor outside the walls stays a space, as
+    # in testcases/level*.txt
+    rows = [row.rstrip() for row in rows]
+    inside = inside_cells(rows)
+    converted = []
+    for y, row in enumerate(rows):
+        converted.append(''.join(' ' if c in floor_chars and (x, y) not in inside else standard_char[c]
+                                 for x, c in enumerate(row)))
+    return converted
+
+def scan_levels(f):
+    """
+    Stream a collection opened in binary mode, one level at a time
+
+    Yields (offset, length, title) of every level: the rows of the level are
+    the `length` bytes at `offset`. title is the 'Title:' line following the
+    level or the comment (';') line right before it, '' if there is none.
+    Non-map lines (titles, comments, blank lines) separate the levels.
+    """
+    offset = 0
+    start = None
+    end = 0
+    title = ''
+    comment = ''
+    for raw in f:
+        line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+        if line.strip() and is_map_line(line.rstrip()):
+            if start is None:
+                start = offset
+                title = comment
+            end = offset + len(raw)
+        else:
+            text = line.strip()
+            if start is not None:
+                if text.lower().startswith('title:'):
+                    title = text[6:].strip()
+                yield start, end - start, title
+                start = None
+                comment = ''
+            elif text.lower().startswith('title:'):
+                comment = text[6:].strip()
+            elif text.startswith(';'):
+                comment = text[1:].strip()
+        offset += len(raw)
+    if start is not None:
+        yield start, end - start, title
+
+class LevelCollection:
+    """
+    Random access to the levels of a multi-level .xsb / .sok file
+
+    The byte-offset index is built by streaming the file once, saved as
+    <file>.idx and reused while the size and mtime of the file don't change;
+    loading a level then reads only its own bytes. Levels are numbered from 1.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.levels = self.load_index()
+
+    def load_index(self):
+        stat = os.stat(self.path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        index_path = self.path + index_suffix
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index['signature'] == signature:
+                return index['levels']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with open(self.path, 'rb') as f:
+            levels = [list(level) for level in scan_levels(f)]
+        try:
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump({'signature': signature, 'levels': levels}, f)
+        except OSError:
+            pass  # read-only directory: index kept in memory only
+        return levels
+
+    def __len__(self):
+        return len(self.levels)
+
+    def title(self, number):
+        return self.levels[number - 1][2]
+
+    def load(self, number):
+        # map of level `number` in repo characters, None if out of range
+        if not 1 <= number <= len(self.levels):
+            return None
+        offset, length, title = self.levels[number - 1]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            rows = f.read(length).decode('utf-8', errors='replace').splitlines()
+        return convert_map(rows)
+
+# open collections by path, so the index is read once per process
+opened = {}
+
+def open_collection(path):
+    if path not in opened:
+        opened[path] = LevelCollection(path)
+    return opened[path]
@@ -1,8 +1,16 @@
 from solver import *
 
 if __name__ == "__main__":
-    
+    # python overall.py [method ...] [--cache], any key of search_methods
+    # --cache reuses cached solutions: no search, no log for those levels
+    use_cache = '--cache' in sys.argv
+    methods = [arg for arg in sys.argv[1:] if arg != '--cache'] or ['BrFS', 'A_star']
+    for method in methods:
+        if method not in search_methods:
+            print(f"Unknown method: {method} (available: {', '.join(search_methods)})")
+            sys.exit(1)
+
     for tc in range(1,40+1):
         # print(tc)
-        for method in ['BrFS', 'A_star']:
-            solver(tc, method)
\ No newline at end of file
+        for method in methods:
+            solver(tc, method, use_cache=use_cache)
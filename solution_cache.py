@@ -0,0 +1,103 @@
+import os, time
+import json
+import sqlite3
+import hashlib
+
+# sqlite file shared by every process: WAL mode lets readers go on while one
+# process writes, writers wait for each other (busy timeout)
+cache_path = "cache/solutions.db"
+
+# total size of the stored paths and stats before the least recently used
+# entries are evicted
+cache_max_bytes = 64 * 1024 * 1024
+
+# a hit refreshes last_used at most once per touch_interval seconds, so
+# lookups don't turn into writes
+touch_interval = 3600
+
+def level_key(map, method, version):
+    # content hash of the map + method + solver version
+    # trailing spaces and empty rows don't change the key
+    rows = [row.rstrip() for row in map]
+    text = "\n".join(row for row in rows if row)
+    return hashlib.sha256(f"{version}\0{method}\0{text}".encode('utf-8')).hexdigest()
+
+class SolutionCache:
+    """
+    Solved levels on disk: level_key -> result dict (path and stats)
+
+    The connection is opened on first use, and again in a forked child, so
+    one instance can be shared by every process of a batch. Errors (read-only
+    directory, corrupt file, ...) are printed and the cache behaves as empty:
+    the solver never fails because of it.
+    """
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or cache_path
+        self.max_bytes = max_bytes or cache_max_bytes
+        self.db = None
+        self.pid = None
+
+    def connect(self):
+        if self.db is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, method TEXT, "
+                       "result TEXT, size INTEGER, created REAL, last_used REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+            self.db = db
+            self.pid = os.getpid()
+        return self.db
+
+    def get(self, key):
+        # stored result dict, None if the level isn't cached
+        try:
+            db = self.connect()
+            row = db.execute("SELECT result, last_used FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > touch_interval:
+                db.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Lỗi cache: {e}")
+            return None
+
+    def put(self, key, method, result):
+        # store result, then evict the least recently used entries over max_bytes
+        text = json.dumps(result)
+        now = time.time()
+        try:
+            db = self.connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+                           (key, method, text, len(text), now, now))
+                self.evict(db)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as e:
+            print(f"Lỗi cache: {e}")
+
+    def evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM solutions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # free down to 90% so that eviction doesn't run on every put
+        excess = total - self.max_bytes * 9 // 10
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM solutions ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM solutions WHERE key = ?", victims)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
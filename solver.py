@@ -3,8 +3,18 @@ from datetime import datetime
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 import heapq
-import tracemalloc
-import gc
+from collections import deque, OrderedDict
+from bisect import insort
+from itertools import combinations
+from array import array
+import random
+import instrument
+from instrument import SearchProfiler, perf_counter
+from solution_cache import SolutionCache, level_key
+from level_collection import open_collection
+import multiprocessing as mp
+import queue
+from multiprocessing.connection import wait
 
 def render_map(walls, boxes, player, goal, map_width, map_height):
     map_template = [['.' for _ in range(map_width)] for _ in range(map_height)]
@@ -171,44 +181,602 @@ def is_block_2x2_deadlock(x, y, boxes, walls, goals):
                 return True
     return False
 
+def is_frozen(level, boxes, c, seen, group):
+    # box c can't move along either axis: each axis is blocked by a wall, by
+    # dead squares on both sides or by a frozen box. boxes in seen are being
+    # checked higher up and count as walls (cycles); frozen boxes are added
+    # to group and seen, and taken back out if c turns out not frozen
+    wall = level.wall
+    dead = level.dead
+    seen.add(c)
+    mark = len(group)
+    for off in (1, level.stride):
+        a, b = c - off, c + off
+        if wall[a] or wall[b] or a in seen or b in seen:
+            continue
+        if dead[a] and dead[b]:
+            continue
+        if a in boxes and is_frozen(level, boxes, a, seen, group):
+            continue
+        if b in boxes and is_frozen(level, boxes, b, seen, group):
+            continue
+        seen.discard(c)
+        seen.difference_update(group[mark:])
+        del group[mark:]
+        return False
+    group.append(c)
+    return True
+
+# box configurations whose freeze check is kept per level (see is_box_deadlock)
+freeze_cache_size = 200000
+
+# push-level searches only push the boxes of a PI-corral when there is one
+# (see SokobanState.pi_corral_pushes)
+pi_corral_pruning = True
+
+# level define - static data of one level, built once and shared by every state
+# walls, goal - sets / lists of (x,y) positions (same as loadInfoFromMap)
+# cells are indexed as (y + 1) * stride + x with stride = width + 1, so the
+# extra column and the rows above / below the map are out-of-map padding
+# wall - bytearray, wall[cell] == 1 for walls and padding
+# is_goal - bytearray, is_goal[cell] == 1 for goals
+# push_distance - NumPy array [goal index, cell], least pushes to bring a box
+#                 from cell to that goal (walls only), unreachable if it can't
+# dead - bytearray, dead[cell] == 1 if a box there can never reach a goal
+# zobrist_box, zobrist_player - random 60-bit key per cell (two int digits,
+#                              hash(key) == key), see SokobanState
+# tunnel, goal_rooms, room_at - macro move tables, None until prepare_macros
+#                               (see find_tunnels, find_goal_rooms)
+# freeze_cache - LRU (box, boxes) -> freeze deadlock found, see is_box_deadlock
+# patterns - PatternDatabase, None until prepare_patterns
+class Level:
+    __slots__ = ('width', 'height', 'stride', 'walls', 'goal', 'wall', 'is_goal',
+                 'goal_cells', 'xy', 'offset', 'push_distance', 'dead', 'zobrist_box',
+                 'zobrist_player', 'tunnel', 'goal_rooms', 'room_at', 'freeze_cache', 'patterns')
+
+    def __init__(self, walls, goal, width, height):
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.walls = frozenset(walls)
+        self.goal = list(goal)
+        size = (height + 2) * self.stride
+        self.wall = bytearray(b'\x01' * size)
+        self.is_goal = bytearray(size)
+        self.xy = [None] * size
+        for y in range(height):
+            for x in range(width):
+                c = self.cell((x, y))
+                self.xy[c] = (x, y)
+                if (x, y) not in self.walls:
+                    self.wall[c] = 0
+        for pos in self.goal:
+            self.is_goal[self.cell(pos)] = 1
+        self.goal_cells = tuple(sorted(self.cell(pos) for pos in self.goal))
+        self.offset = {
+            'up': -self.stride,
+            'down': self.stride,
+            'left': -1,
+            'right': 1
+        }
+        self.push_distance = find_push_distances(self)
+        self.dead = find_dead_squares(self)
+        # fixed seed: every process building the same level gets the same keys
+        rng = random.Random(zobrist_seed)
+        self.zobrist_box = [rng.getrandbits(60) for _ in range(size)]
+        self.zobrist_player = [rng.getrandbits(60) for _ in range(size)]
+        self.tunnel = None
+        self.goal_rooms = None
+        self.room_at = None
+        self.freeze_cache = OrderedDict()
+        self.patterns = None
+
+    def prepare_macros(self):
+        # tunnels and goal rooms, only built for searches using macros
+        if self.tunnel is None:
+            self.tunnel = find_tunnels(self)
+            self.goal_rooms = find_goal_rooms(self)
+            self.room_at = {room.entrance: room for room in self.goal_rooms}
+
+    def prepare_patterns(self):
+        # pattern database, only built for searches using it
+        if self.patterns is None:
+            self.patterns = PatternDatabase(self)
+
+    def cell(self, pos):
+        x, y = pos
+        return (y + 1) * self.stride + x
+
+    def box_hash(self, boxes):
+        h = 0
+        for c in boxes:
+            h ^= self.zobrist_box[c]
+        return h
+
+# distance of a cell no box can be pushed from to a goal; large enough to
+# never be chosen, small enough that sums of them fit in int64
+unreachable = 10 ** 6
+
+def find_push_distances(level):
+    # reverse search: pull a box away from each goal. a pull moves the box
+    # from c to c + off and the player from c + off to c + 2 * off, so both
+    # cells must be free. the BrFS depth of a cell is the least number of
+    # pushes that bring a box from it back to the goal, ignoring other boxes
+    wall = level.wall
+    offsets = tuple(level.offset.values())
+    distance = np.full((len(level.goal_cells), len(wall)), unreachable, dtype=np.int64)
+    for i, g in enumerate(level.goal_cells):
+        row = distance[i]
+        row[g] = 0
+        layer = [g]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for c in layer:
+                for off in offsets:
+                    nxt = c + off
+                    if row[nxt] != unreachable or wall[nxt] or wall[nxt + off]:
+                        continue
+                    row[nxt] = depth
+                    next_layer.append(nxt)
+            layer = next_layer
+    return distance
+
+def find_dead_squares(level):
+    # a floor cell no goal can be pulled back to is dead (covers corners and
+    # edge corridors), see find_push_distances
+    reachable = (level.push_distance < unreachable).any(axis=0)
+    wall = level.wall
+    return bytearray(not reachable[c] and not wall[c] for c in range(len(wall)))
+
+zobrist_seed = 20251025
+
+def find_tunnels(level):
+    # tunnel[c] has bit `code` set when a box pushed onto c in direction code
+    # leaves both the box and the player (on c - off) between two walls:
+    # nothing can get past the box, so the push goes on until the box leaves
+    # the tunnel (see explore_pushes macros). a goal ends the tunnel
+    wall = level.wall
+    tunnel = bytearray(len(wall))
+    for code, dir in enumerate(direction):
+        off = level.offset[dir]
+        side = level.offset['left'] if dir in ('up', 'down') else level.offset['up']
+        for c in range(len(wall)):
+            if wall[c] or level.is_goal[c] or level.dead[c] or wall[c - off]:
+                continue
+            player = c - off
+            if wall[c + side] and wall[c - side] and wall[player + side] and wall[player - side]:
+                tunnel[c] |= 1 << code
+    return tunnel
+
+# goal room define - floor cells holding goals that the rest of the level
+# reaches through one entrance cell only
+# cells - frozenset of the room cells (entrance excluded)
+# entrance - cell boxes enter the room through
+# order - goals in the order they are filled, None if no order was found
+# fills - (boxes already in, push direction code) -> (goal, push codes,
+#         player cell) of the macro bringing a box from the entrance to the
+#         next goal of order, None if there is none
+class GoalRoom:
+    __slots__ = ('cells', 'entrance', 'order', 'fills')
+
+    def __init__(self, level, cells, entrance):
+        self.cells = frozenset(cells)
+        self.entrance = entrance
+        self.fills = {}
+        self.order = self.find_order(level)
+
+    def entry_codes(self, level):
+        # push directions that bring a box onto the entrance from outside
+        codes = []
+        for code, dir in enumerate(direction):
+            off = level.offset[dir]
+            behind = self.entrance - off
+            if behind not in self.cells and not level.wall[behind] and not level.wall[behind - off]:
+                codes.append(code)
+        return codes
+
+    def fill_path(self, level, filled, code, target):
+        # BrFS over (box, player) inside the room: pushes bringing the box
+        # from the entrance (pushed in direction code) to target around the
+        # filled goals, the player must be able to walk out afterwards
+        # return (push codes, player cell) or None
+        wall = level.wall
+        entrance = self.entrance
+        start_player = entrance - level.offset[direction[code]]
+        allowed = self.cells | {entrance, start_player}
+        start = (entrance, start_player)
+        came_from = {start: None}
+        queue = deque([start])
+        while queue:
+            box, player = queue.popleft()
+            if box == target and entrance in reachable_cells(level, player, filled | {box}):
+                pushes = []
+                node = (box, player)
+                while came_from[node] is not None:
+                    node, push = came_from[node]
+                    if push is not None:
+                        pushes.append(push)
+                pushes.reverse()
+                return pushes, player
+            for push_code, dir in enumerate(direction):
+                off = level.offset[dir]
+                nxt = player + off
+                if nxt not in allowed or wall[nxt] or nxt in filled:
+                    continue
+                if nxt == box:
+                    new_box = box + off
+                    if new_box not in self.cells or new_box in filled:
+                        continue
+                    node = (new_box, nxt)
+                    push = box * 4 + push_code
+                else:
+                    node = (box, nxt)
+                    push = None
+                if node not in came_from:
+                    came_from[node] = ((box, player), push)
+                    queue.append(node)
+        return None
+
+    def find_order(self, level):
+        # greedy: fill the goal farthest from the entrance that a box can
+        # still reach, as long as every goal left stays reachable too
+        codes = self.entry_codes(level)
+        if not codes:
+            return None
+        goals = [c for c in self.cells if level.is_goal[c]]
+        distance = {c: int(level.push_distance[level.goal_cells.index(c), self.entrance]) for c in goals}
+        goals.sort(key=lambda c: (distance[c] >= unreachable, -distance[c]))
+        order = []
+        filled = frozenset()
+        while len(order) < len(goals):
+            for target in goals:
+                if target in filled:
+                    continue
+                after = filled | {target}
+                if all(self.fill_path(level, filled, code, target) is None for code in codes):
+                    continue
+                if all(any(self.fill_path(level, after, code, g) is not None for code in codes)
+                       for g in goals if g not in after):
+                    break
+            else:
+                return None
+            order.append(target)
+            filled = after
+        return tuple(order)
+
+    def fill(self, level, boxes, code):
+        # macro for a box just pushed onto the entrance in direction code:
+        # (goal, push codes, player cell), None if the room isn't filled
+        # along order so far or no macro exists
+        if self.order is None:
+            return None
+        inside = [c for c in boxes if c in self.cells]
+        k = len(inside)
+        if k >= len(self.order) or set(inside) != set(self.order[:k]):
+            return None
+        key = (k, code)
+        if key not in self.fills:
+            target = self.order[k]
+            found = self.fill_path(level, frozenset(self.order[:k]), code, target)
+            self.fills[key] = None if found is None else (target, *found)
+        return self.fills[key]
+
+# bigger rooms are left to the plain search (the fill order costs
+# goals^2 searches over cells^2 states)
+goal_room_max_cells = 48
+
+def find_goal_rooms(level):
+    # for every floor cell, remove it and flood the rest: the smaller side
+    # holding at least two goals is a room with that cell as entrance.
+    # rooms with the most goals (then the fewest cells) win, disjoint only
+    wall = level.wall
+    offsets = tuple(level.offset.values())
+    floor = [c for c in range(len(wall)) if not wall[c]]
+    candidates = []
+    for entrance in floor:
+        if level.is_goal[entrance]:
+            continue
+        seen = {entrance}
+        parts = []
+        for off in offsets:
+            start = entrance + off
+            if wall[start] or start in seen:
+                continue
+            part = reachable_cells(level, start, seen)
+            seen |= part
+            parts.append(part)
+        if len(parts) < 2:
+            continue
+        parts.sort(key=len)
+        room = parts[0]
+        goals = sum(level.is_goal[c] for c in room)
+        if goals >= 2 and len(room) <= goal_room_max_cells:
+            candidates.append((-goals, len(room), entrance, room))
+    candidates.sort(key=lambda candidate: candidate[:3])
+    rooms = []
+    used = set()
+    for _, _, entrance, room in candidates:
+        if entrance in used or used & room:
+            continue
+        goal_room = GoalRoom(level, room, entrance)
+        if goal_room.order is not None:
+            rooms.append(goal_room)
+            used |= room | {entrance}
+    return rooms
+
+def label_regions(level, boxes):
+    # label[c] = smallest cell of the player region holding c, -1 on walls
+    # and boxes (regions are numbered by their smallest cell)
+    wall = level.wall
+    offsets = tuple(level.offset.values())
+    label = [-1] * len(wall)
+    for c in boxes:
+        label[c] = -2
+    for c in range(len(wall)):
+        if label[c] != -1 or wall[c]:
+            continue
+        label[c] = c
+        stack = [c]
+        while stack:
+            cur = stack.pop()
+            for off in offsets:
+                nxt = cur + off
+                if label[nxt] == -1 and not wall[nxt]:
+                    label[nxt] = c
+                    stack.append(nxt)
+    for c in boxes:
+        label[c] = -1
+    return label
+
+# boxes per pattern of PatternDatabase (2: pairs, 3: triples); smaller
+# patterns are used when live cells ** size would exceed pattern_max_entries
+pattern_size = 3
+pattern_max_entries = 1 << 21
+
+class PatternDatabase:
+    """
+    Least pushes to bring every set of `size` boxes (pairs, triples) to
+    `size` distinct goals, the other boxes left out
+
+    Built by a backward breadth-first search over pulls from every set of
+    goals with the player in any region next to a box, the player kept as
+    the smallest cell of its region. The first time a box set is reached is
+    its distance (least over the player regions); box sets never reached
+    can't be solved at all. Distances are stored in a NumPy uint16 array
+    indexed by the live cells (not walls, not dead squares) of the boxes.
+
+    value(boxes) adds up disjoint patterns: each box costs at least its
+    nearest goal distance, a pattern whose distance exceeds the sum of
+    those of its boxes adds the difference. Patterns are taken greedily,
+    largest gain first, so the sum stays a lower bound on the pushes.
+    """
+    def __init__(self, level, size=None):
+        start_time = time.time()
+        wall = level.wall
+        live = [c for c in range(len(wall)) if not wall[c] and not level.dead[c]]
+        self.size = size or pattern_size
+        while self.size > 2 and len(live) ** self.size > pattern_max_entries:
+            self.size -= 1
+        self.index = [-1] * len(wall)
+        for i, c in enumerate(live):
+            self.index[c] = i
+        self.nearest = level.push_distance.min(axis=0).tolist()
+        self.unsolvable = np.iinfo(np.uint16).max
+        self.table = np.full((len(live),) * self.size, self.unsolvable, dtype=np.uint16)
+        self.goal_count = len(level.goal_cells)
+        self.enabled = self.goal_count >= self.size
+        if self.enabled:
+            self.build(level)
+        self.build_time = time.time() - start_time
+
+    def build(self, level):
+        wall = level.wall
+        offsets = tuple(level.offset.values())
+        index = self.index
+        table = self.table
+        layer = []
+        seen = set()
+        for boxes in combinations(level.goal_cells, self.size):
+            label = label_regions(level, boxes)
+            table[tuple(index[c] for c in boxes)] = 0
+            for region in {label[c + off] for c in boxes for off in offsets} - {-1}:
+                seen.add((boxes, region))
+                layer.append((boxes, region))
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for boxes, region in layer:
+                label = label_regions(level, boxes)
+                for b in boxes:
+                    for off in offsets:
+                        # player on b + off, steps back to b + 2 * off
+                        # pulling the box onto b + off
+                        cell = b + off
+                        behind = cell + off
+                        if (label[cell] != region or wall[behind] or behind in boxes
+                                or index[cell] < 0):
+                            continue
+                        new_boxes = tuple(sorted(cell if c == b else c for c in boxes))
+                        new_label = label_regions(level, new_boxes)
+                        state = (new_boxes, new_label[behind])
+                        if state in seen:
+                            continue
+                        seen.add(state)
+                        next_layer.append(state)
+                        key = tuple(index[c] for c in new_boxes)
+                        if table[key] > depth:
+                            table[key] = depth
+            layer = next_layer
+
+    def value(self, boxes):
+        # lower bound on the pushes left, unreachable if a pattern can't be solved
+        index = self.index
+        nearest = self.nearest
+        if (not self.enabled or not self.size <= len(boxes) <= self.goal_count
+                or any(index[c] < 0 for c in boxes)):
+            # more boxes than goals: a box may never reach a goal
+            return 0
+        table = self.table
+        gains = []
+        for pattern in combinations(range(len(boxes)), self.size):
+            distance = table[tuple(index[boxes[i]] for i in pattern)]
+            if distance == self.unsolvable:
+                return unreachable
+            gain = int(distance) - sum(nearest[boxes[i]] for i in pattern)
+            if gain > 0:
+                gains.append((gain, pattern))
+        gains.sort(reverse=True)
+        total = sum(nearest[c] for c in boxes)
+        used = set()
+        for gain, pattern in gains:
+            if used.isdisjoint(pattern):
+                used.update(pattern)
+                total += gain
+        return total
+
+    def stats(self):
+        return {
+            'pdb_build_time': self.build_time,
+            'pdb_size': self.size,
+            'pdb_entries': int((self.table != self.unsolvable).sum()),
+            'pdb_bytes': self.table.nbytes
+        }
+
+def make_init_state(map):
+    # build the level once from the map and return the initial state
+    boxes, walls, player, goal = loadInfoFromMap(map)
+    level = Level(walls, goal, max(len(row) for row in map), len(map))
+    return SokobanState(level, tuple(sorted(level.cell(b) for b in boxes)), level.cell(player))
+
+def replace_box(boxes, old, new):
+    # boxes is a sorted tuple of cells, keep it sorted
+    new_boxes = list(boxes)
+    new_boxes.remove(old)
+    insort(new_boxes, new)
+    return tuple(new_boxes)
+
 # state define
-# map - 2D array of chars
-# boxes - list of (x,y) positions
-# player - (x,y) position
+# level - shared Level
+# boxes - sorted tuple of cells
+# player - cell
+# parent - state this one was generated from (None for the initial state)
+# last_move - code of the move from parent: index in direction for a step,
+#        box * 4 + index in direction for a push-level node
+# pushed - cell the box pushed by last_move ended on (None if no box moved)
+# box_hash - XOR of level.zobrist_box over boxes, updated on each push
+# map - 2D array of chars, rendered on demand
+# path - list of directions, rebuilt from the parent chain on demand
 class SokobanState:
-    def __init__(self, map, boxes, walls, player, goal, path):
-        self.map = map
+    __slots__ = ('level', 'boxes', 'player', 'box_hash', 'parent', 'last_move', 'pushed')
+
+    def __init__(self, level, boxes, player, box_hash=None, parent=None, last_move=None, pushed=None):
+        self.level = level
         self.boxes = boxes
-        self.walls = walls
         self.player = player
-        self.goal = goal
-        self.path = path
+        self.box_hash = level.box_hash(boxes) if box_hash is None else box_hash
+        self.parent = parent
+        self.last_move = last_move
+        self.pushed = pushed
 
     def __eq__(self, other):
-        return isinstance(other, SokobanState) and self.player == other.player and set(self.boxes) == set(other.boxes)
+        return isinstance(other, SokobanState) and self.player == other.player and self.boxes == other.boxes
 
     def __hash__(self):
-        # Sort boxes so order doesn't matter
-        return hash((self.player, tuple(sorted(self.boxes))))
+        # zobrist hash, no need to walk the boxes
+        return self.box_hash ^ self.level.zobrist_player[self.player]
+
+    @property
+    def map(self):
+        level = self.level
+        profiler = instrument.current
+        if profiler is not None and profiler.timing:
+            t = perf_counter()
+        rendered = render_map(level.walls, self.box_positions(), level.xy[self.player], level.goal,
+                              level.width, level.height)
+        if profiler is not None and profiler.timing:
+            profiler.lap('render_map', t)
+        return rendered
+
+    @property
+    def path(self):
+        return [direction[code] for code in self.move_codes()]
+
+    def pushes(self):
+        # push-level path as (box, direction) pairs, see expand_pushes
+        return push_pairs(self.move_codes())
+
+    def move_codes(self):
+        codes = []
+        state = self
+        while state.parent is not None:
+            codes.append(state.last_move)
+            state = state.parent
+        codes.reverse()
+        return codes
+
+    @property
+    def walls(self):
+        return self.level.walls
+
+    @property
+    def goal(self):
+        return self.level.goal
+
+    def box_positions(self):
+        # boxes as (x,y) positions
+        xy = self.level.xy
+        return [xy[c] for c in self.boxes]
 
     def to_str(self):
         pass
 
-    def is_win(self, goal):
-        # check if all boxes are on goals
-        return set(goal).issubset(set(self.boxes))
+    def is_win(self, goal=None):
+        # check if all boxes are on goals (goal kept for compatibility, the
+        # level already knows its goals)
+        goal_cells = self.level.goal_cells
+        if len(goal_cells) == len(self.boxes):
+            return self.boxes == goal_cells
+        return set(goal_cells).issubset(self.boxes)
 
     def is_deadlock(self):
-        for (x, y) in self.boxes:
-            if is_corner_deadlock(x, y, self.walls, self.goal):
-                return True
-            # Edge deadlock - ENABLED with conservative improved version
-            # Only detects truly blocked corridors with no escape routes
-            if is_edge_deadlock(x, y, self.walls, self.goal):
-                return True
-            if is_block_2x2_deadlock(x, y, self.boxes, self.walls, self.goal):
-                return True
-        return False
+        # incremental: the parent was checked already, so only the box pushed
+        # into this state can create a new deadlock
+        if self.parent is None:
+            return any(self.is_box_deadlock(c) for c in self.boxes)
+        if self.pushed is None:
+            return False
+        return self.is_box_deadlock(self.pushed)
+
+    def is_box_deadlock(self, c):
+        # dead squares (precomputed per level) replace the corner and edge
+        # checks, see find_dead_squares
+        level = self.level
+        if level.dead[c]:
+            return True
+        # freeze deadlock (covers the 2x2 block): c can't move along either
+        # axis, and a box of the frozen group is off goal
+        boxes = self.boxes
+        s = level.stride
+        if not (c - 1 in boxes or c + 1 in boxes or c - s in boxes or c + s in boxes):
+            # no neighbour box: frozen only against walls and dead squares,
+            # off goal that is a dead square already
+            return False
+        cache = level.freeze_cache
+        key = (c, boxes)
+        found = cache.get(key)
+        if found is not None:
+            cache.move_to_end(key)
+            return found
+        group = []
+        found = (is_frozen(level, boxes, c, set(), group)
+                 and not all(level.is_goal[b] for b in group))
+        cache[key] = found
+        if len(cache) > freeze_cache_size:
+            cache.popitem(last=False)
+        return found
 
     def explore_neighbors(self):
         # explore neighbors of current state
@@ -225,56 +793,185 @@ class SokobanState:
 
         return neighbors
 
-    def move(self, direction):
+    def normalized(self):
+        # push-level state: the player is replaced by the canonical (smallest)
+        # cell of its reachable region, so states that differ only by where
+        # the player stands inside the same region compare equal
+        canonical = min(reachable_cells(self.level, self.player, self.boxes))
+        return SokobanState(self.level, self.boxes, canonical, self.box_hash)
+
+    def explore_pushes(self, macros=False):
+        # explore push-level neighbors: one successor per box push the player
+        # can reach without moving any other box, see pushes()
+        # macros: a push into a tunnel goes on until the box leaves it, a box
+        # pushed onto a goal room entrance goes straight to the next goal of
+        # the room; last_move is then a tuple of push codes (level.prepare_macros)
+        level = self.level
+        wall = level.wall
+        zobrist_box = level.zobrist_box
+        reachable = reachable_cells(level, self.player, self.boxes)
+        allowed = self.pi_corral_pushes(reachable) if pi_corral_pruning else None
+        neighbors = []
+        for box in self.boxes:
+            for code, dir in enumerate(direction):
+                off = level.offset[dir]
+                if box - off not in reachable:
+                    continue
+                new_box = box + off
+                if wall[new_box] or new_box in self.boxes:
+                    continue
+                if allowed is not None and (box, code) not in allowed:
+                    continue
+                new_boxes = replace_box(self.boxes, box, new_box)
+                last_move = box * 4 + code
+                player = box
+                if macros:
+                    new_box, new_boxes, player, last_move = self.macro_push(new_box, new_boxes, code, last_move)
+                canonical = min(reachable_cells(level, player, new_boxes))
+                box_hash = self.box_hash ^ zobrist_box[box] ^ zobrist_box[new_box]
+                neighbors.append(SokobanState(level, new_boxes, canonical, box_hash, self, last_move, new_box))
+        return neighbors
+
+    def pi_corral_pushes(self, reachable):
+        """
+        Pushes (box, code) of the best PI-corral, None if there is none
 
-        new_boxes = self.boxes.copy()  
-        new_player = self.player
-
-        if (direction == "up"):
-            new_player = (new_player[0], new_player[1] - 1)
-        elif (direction == "down"):
-            new_player = (new_player[0], new_player[1] + 1)
-        elif (direction == "left"):
-            new_player = (new_player[0] - 1, new_player[1])
-        elif (direction == "right"):
-            new_player = (new_player[0] + 1, new_player[1])
-        else:    
+        A corral is an area the player can't reach, closed by boxes. It is a
+        PI-corral when every push the player can do on its barrier boxes goes
+        into it (I) and every push into it can be done now (P). Some box of
+        it has to be pushed into it before the rest matters, so only these
+        pushes are generated, for the PI-corral with the fewest of them.
+        Corrals whose boxes are all on goals are left alone.
+        """
+        level = self.level
+        wall = level.wall
+        boxes = self.boxes
+        offsets = [(code, level.offset[dir]) for code, dir in enumerate(direction)]
+        seen = set()
+        best = None
+        for start_box in boxes:
+            for _, off in offsets:
+                start = start_box + off
+                if wall[start] or start in reachable or start in boxes or start in seen:
+                    continue
+                # flood the corral: cells out of the player's reach, boxes included
+                area = {start}
+                stack = [start]
+                while stack:
+                    c = stack.pop()
+                    for _, o in offsets:
+                        nxt = c + o
+                        if nxt in area or wall[nxt] or nxt in reachable:
+                            continue
+                        area.add(nxt)
+                        stack.append(nxt)
+                seen |= area
+                corral_boxes = [b for b in boxes if b in area]
+                if all(level.is_goal[b] for b in corral_boxes):
+                    continue
+                pushes = set()
+                for b in corral_boxes:
+                    if not any(b + o in reachable for _, o in offsets):
+                        continue  # inside the corral, not on its barrier
+                    for code, o in offsets:
+                        target, behind = b + o, b - o
+                        if wall[target] or target in boxes:
+                            continue
+                        if behind in reachable:
+                            if target not in area:
+                                break  # I: a push out of the corral
+                            pushes.add((b, code))
+                        elif not wall[behind] and target in area:
+                            break  # P: a push into the corral not possible yet
+                    else:
+                        continue
+                    pushes = None
+                    break
+                if pushes and (best is None or len(pushes) < len(best)):
+                    best = pushes
+        return best
+
+    def macro_push(self, new_box, new_boxes, code, last_move):
+        # extend the push that just moved a box onto new_box in direction code
+        # return new_box, new_boxes, player, last_move after the macro
+        level = self.level
+        wall = level.wall
+        dead = level.dead
+        tunnel = level.tunnel
+        off = level.offset[direction[code]]
+        moves = [last_move]
+        player = new_box - off
+        while True:
+            room = level.room_at.get(new_box)
+            if room is not None and player not in room.cells:
+                fill = room.fill(level, new_boxes, code)
+                if fill is not None:
+                    target, fill_moves, player = fill
+                    new_boxes = replace_box(new_boxes, new_box, target)
+                    moves += fill_moves
+                    new_box = target
+                break
+            nxt = new_box + off
+            if not tunnel[new_box] >> code & 1 or wall[nxt] or dead[nxt] or nxt in new_boxes:
+                break
+            moves.append(new_box * 4 + code)
+            new_boxes = replace_box(new_boxes, new_box, nxt)
+            player = new_box
+            new_box = nxt
+        if len(moves) > 1:
+            last_move = tuple(moves)
+        return new_box, new_boxes, player, last_move
+
+    def explore_pulls(self):
+        # reverse of explore_pushes, used by the backward search: the player
+        # stands at box - off and pulls the box to box - off, ending on
+        # box - 2 * off. last_move holds the forward push that undoes the
+        # pull, so walking parents of a backward state yields pushes in order
+        level = self.level
+        wall = level.wall
+        zobrist_box = level.zobrist_box
+        reachable = reachable_cells(level, self.player, self.boxes)
+        neighbors = []
+        for box in self.boxes:
+            for code, dir in enumerate(direction):
+                off = level.offset[dir]
+                new_box = box - off
+                if new_box not in reachable:
+                    continue
+                new_player = new_box - off
+                if wall[new_player] or new_player in self.boxes:
+                    continue
+                new_boxes = replace_box(self.boxes, box, new_box)
+                canonical = min(reachable_cells(level, new_player, new_boxes))
+                box_hash = self.box_hash ^ zobrist_box[box] ^ zobrist_box[new_box]
+                neighbors.append(SokobanState(level, new_boxes, canonical, box_hash, self, new_box * 4 + code, new_box))
+        return neighbors
+
+    def move(self, direction):
+        level = self.level
+        off = level.offset.get(direction)
+        if off is None:
             # print("Invalid direction")
             return None # invalid direction, ignore
-        
-        if (self.walls.__contains__(new_player)):
+
+        new_player = self.player + off
+        if level.wall[new_player]:
             # print("Hit wall")
             return None # hit wall, ignore
-        
-        if (new_boxes.__contains__(new_player)):
-            if (direction == "up"):
-                new_box = (new_player[0], new_player[1] - 1)
-            elif (direction == "down"):
-                new_box = (new_player[0], new_player[1] + 1)
-            elif (direction == "left"):
-                new_box = (new_player[0] - 1, new_player[1])
-            elif (direction == "right"):
-                new_box = (new_player[0] + 1, new_player[1])
-
-            if (self.walls.__contains__(new_box) or new_boxes.__contains__(new_box)):
+
+        if new_player in self.boxes:
+            new_box = new_player + off
+            if level.wall[new_box] or new_box in self.boxes:
                 # print("Box stuck")
                 return None # box stuck, ignore
-            else:
-                new_boxes.remove(new_player)
-                new_boxes.append(new_box)
-                
-                # print("Move box")
-                # update map
-                new_map = render_map(self.walls, new_boxes, new_player, self.goal,
-                                len(self.map[0]), len(self.map))
-
-                return SokobanState(new_map, new_boxes, self.walls, new_player, self.goal, self.path + [direction])
-        
+            # print("Move box")
+            box_hash = self.box_hash ^ level.zobrist_box[new_player] ^ level.zobrist_box[new_box]
+            return SokobanState(level, replace_box(self.boxes, new_player, new_box), new_player, box_hash,
+                                self, direction_code[direction], new_box)
+
         # print("Move player")
-        new_map = render_map(self.walls, new_boxes, new_player, self.goal,
-                                len(self.map[0]), len(self.map))
-        
-        return SokobanState(new_map, new_boxes, self.walls, new_player, self.goal, self.path + [direction])
+        # boxes did not move, share the tuple
+        return SokobanState(level, self.boxes, new_player, self.box_hash, self, direction_code[direction])
     
 # goal - list of (x,y) positions
 
@@ -289,6 +986,71 @@ tile_char = {
 }
 
 direction = ['up', 'down', 'left', 'right']
+direction_code = {dir: code for code, dir in enumerate(direction)}
+
+def reachable_cells(level, player, boxes):
+    # flood fill: every cell the player can walk to without pushing a box
+    wall = level.wall
+    offsets = tuple(level.offset.values())
+    reached = {player}
+    stack = [player]
+    while stack:
+        c = stack.pop()
+        for off in offsets:
+            nxt = c + off
+            if nxt in reached or wall[nxt] or nxt in boxes:
+                continue
+            reached.add(nxt)
+            stack.append(nxt)
+    return reached
+
+def find_walk(level, start, target, boxes):
+    # shortest player walk (list of directions) from start to target, no pushes
+    if start == target:
+        return []
+    wall = level.wall
+    came_from = {start: None}
+    queue = deque([start])
+    while queue:
+        c = queue.popleft()
+        for dir in direction:
+            nxt = c + level.offset[dir]
+            if nxt in came_from or wall[nxt] or nxt in boxes:
+                continue
+            came_from[nxt] = (c, dir)
+            if nxt == target:
+                walk = []
+                while came_from[nxt] is not None:
+                    nxt, dir = came_from[nxt]
+                    walk.append(dir)
+                walk.reverse()
+                return walk
+            queue.append(nxt)
+    return None
+
+def push_pairs(codes):
+    # push codes -> (box, direction) pairs
+    # a macro node (see explore_pushes) holds a tuple of push codes
+    pushes = []
+    for code in codes:
+        for push in (code if isinstance(code, tuple) else (code,)):
+            pushes.append((push >> 2, direction[push & 3]))
+    return pushes
+
+def expand_pushes(init_state, pushes):
+    # turn a push-level solution [(box, direction), ...] back into the full
+    # up/down/left/right path by walking the player to each push position
+    level = init_state.level
+    path = []
+    boxes = init_state.boxes
+    player = init_state.player
+    for box, dir in pushes:
+        off = level.offset[dir]
+        path += find_walk(level, player, box - off, boxes)
+        path.append(dir)
+        boxes = replace_box(boxes, box, box + off)
+        player = box
+    return path
 
 def load_testcase(tc):
     # return map, start, goal from testcases/tc_<id>.txt
@@ -298,6 +1060,18 @@ def load_testcase(tc):
     # first line: width height
     # following lines: map
     #I think no need for width height info.
+    # "<file>:<n>": level n of a multi-level .xsb / .sok collection
+    if isinstance(tc, str) and ':' in tc:
+        filepath, _, number = tc.rpartition(':')
+        try:
+            map_data = open_collection(filepath).load(int(number))
+        except (OSError, ValueError) as e:
+            print(f"Lỗi khi đọc {tc}: {e}")
+            return None
+        if not map_data:
+            print(f"Không tìm thấy testcase: {tc}")
+            return None
+        return map_data
     filepath = f"testcases/level{tc}.txt"
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -314,165 +1088,1024 @@ def load_testcase(tc):
         print(f"Lỗi khi đọc {tc}: {e}")
         return None
 
-def BrFS(init_state, goal):
-    gc.collect()
-    gc.collect()
-    gc.collect()
-    tracemalloc.start()
+def BrFS(init_state, goal, push_level=False, progress=None, budget=None, cancel=None, macros=False):
+    profiler = SearchProfiler(progress=progress, budget=budget, cancel=cancel)
+    profiler.start()
+    timing = profiler.timing
 
     # implement Breadth-First Search algorithm
     # return path (up, down, left, right) from start to goal
     # if no path, return None
+    # push_level: every successor is one box push (see explore_pushes)
+    # progress, budget, cancel: see SearchProfiler, a search stopped by the
+    # budget or the cancel token returns its stats with 'stop_reason'
+    # macros: tunnel and goal room macro pushes (push_level only), a macro
+    # counts as one step, so the solution is no longer the fewest pushes
+    start_state = init_state
+    if push_level:
+        init_state = init_state.normalized()
+    if macros:
+        init_state.level.prepare_macros()
     generated_node = 0
     expand_node = 0
     revisited_node = 0
-    start_time = time.time()
+    solution = None
+    stop_reason = None
 
-    queue = [init_state]
-    visited = set()
-    visited.add(init_state)
+    # visited states, packed; entries from head on are the queue (see StateTable)
+    visited = StateTable(init_state.level)
+    visited.insert(init_state)
+    head = 0
 
-    while len(queue) != 0:
+    while head < len(visited) and solution is None and stop_reason is None:
         # explore node (state) found
-        explored = queue.pop(0).explore_neighbors()
+        current = head
+        current_state = visited.state(current)
+        head += 1
+        if timing: t = perf_counter()
+        explored = current_state.explore_pushes(macros) if push_level else current_state.explore_neighbors()
         expand_node += 1
-        for state in explored:
-            generated_node += 1
-            if state.is_deadlock():
-                continue
+        generated_node += len(explored)
+        if timing: t = profiler.lap('move', t)
 
-            if state in visited:
+        explored = [state for state in explored if not state.is_deadlock()]
+        if timing: t = profiler.lap('is_deadlock', t)
+
+        for state in explored:
+            entry, is_new = visited.insert(state, current)
+            if not is_new:
                 revisited_node += 1
                 continue
-            
+
             if state.is_win(goal):
-                current, peak = tracemalloc.get_traced_memory()
-                tracemalloc.stop()
-                end_time = time.time()
-                result = {
-                    'is_solved': True,
-                    'path': state.path,
-                    'expand_node': expand_node, 
-                    'generated_node': generated_node, 
-                    'revisited_node': revisited_node,
-                    'time_taken': end_time - start_time,    
-                    'memory_used': peak / (1024 * 1024)    
-                }
-                return result
-            
-            queue.append(state)
-            visited.add(state)
+                solution = entry
+                break
+        if timing: t = profiler.lap('visited', t)
+
+        if expand_node % instrument.check_interval == 0:
+            # f = depth of the layer being expanded
+            stop_reason = profiler.checkpoint(expand_node, generated_node, len(visited) - head,
+                                              len(visited.move_codes(current)))
 
-    # no solution
     # return flag, path, explored_nodes, time_taken, memory_used
-    end_time = time.time()
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+    stats = profiler.finish()
+    if solution is None:
+        path = []
+    elif push_level:
+        path = expand_pushes(start_state, push_pairs(visited.move_codes(solution)))
+    else:
+        path = [direction[code] for code in visited.move_codes(solution)]
     result = {
-        'is_solved': False,
-        'path': [],
+        'is_solved': solution is not None,
+        'path': path,
         'expand_node': expand_node,
         'generated_node': generated_node,
         'revisited_node': revisited_node,
-        'time_taken': end_time - start_time,
-        'memory_used': peak / (1024 * 1024)
+        **stats,
+        **visited.stats()
     }
+    if stop_reason is not None:
+        result['stop_reason'] = stop_reason
     return result
 
-def A_star(init_state, goal):
-    gc.collect()
-    gc.collect()
-    gc.collect()
-    tracemalloc.start()
+def layer_keys(boxes, player):
+    # one fixed-size bytes key per row (boxes then player), see BrFS_batch
+    rows = np.ascontiguousarray(np.concatenate((boxes, player[:, None]), axis=1))
+    return rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).ravel()
+
+def BrFS_batch(init_state, goal, progress=None, budget=None, cancel=None):
+    """
+    Breadth-first search expanding a whole layer at once with NumPy
+
+    A layer is an (N, boxes) array of sorted box cells and an (N,) array of
+    player cells. For each direction, walls, boxes, dead squares and the
+    push are computed for every row together through the level's lookup
+    arrays; the new rows are deduplicated with np.unique on their bytes keys
+    and against a sorted array of the keys of every state seen. Each layer
+    keeps only the parent row and move code of its states, the path is
+    walked back through them. Same moves and paths as BrFS, but only dead
+    squares are pruned (no freeze check), so more nodes are generated.
+
+    Args:
+        init_state: State object with initial game state
+        goal: list of goal positions
+        progress, budget, cancel: see SearchProfiler, checked after every
+            layer
+    """
+    profiler = SearchProfiler(progress=progress, budget=budget, cancel=cancel)
+    profiler.start()
+    timing = profiler.timing
+    level = init_state.level
+    cell_type = np.uint16 if len(level.wall) < 1 << 16 else np.uint32
+    wall = np.frombuffer(bytes(level.wall), dtype=np.uint8).astype(bool)
+    dead = np.frombuffer(bytes(level.dead), dtype=np.uint8).astype(bool)
+    is_goal = np.frombuffer(bytes(level.is_goal), dtype=np.uint8).astype(bool)
+    last_cell = len(wall) - 1
+    goal_count = len(level.goal_cells)
+    generated_node = 0
+    expand_node = 0
+    revisited_node = 0
+    solution = None
+    stop_reason = None
+
+    boxes = np.array([init_state.boxes], dtype=cell_type).reshape(1, len(init_state.boxes))
+    player = np.array([init_state.player], dtype=cell_type)
+    visited = layer_keys(boxes, player)  # sorted
+    layers = []  # (parent row, move code) of every state of each layer
+    if init_state.is_win(goal):
+        solution = 0
+
+    while len(player) and solution is None and stop_reason is None:
+        expand_node += len(player)
+        if timing: t = perf_counter()
+        players = player.astype(np.int64)
+        children = []
+        for code, dir in enumerate(direction):
+            offset = level.offset[dir]
+            target = players + offset
+            hit = boxes == target[:, None].astype(cell_type)
+            pushed = hit.any(axis=1)
+            beyond = np.clip(target + offset, 0, last_cell)
+            blocked = pushed & (wall[beyond] | (boxes == beyond[:, None].astype(cell_type)).any(axis=1))
+            valid = ~wall[target] & ~blocked
+            generated_node += int(valid.sum())
+            # dead square: a box pushed onto it can never reach a goal
+            valid &= ~(pushed & dead[beyond])
+            rows = np.nonzero(valid)[0]
+            new_boxes = np.where(hit[rows], beyond[rows, None].astype(cell_type), boxes[rows])
+            new_boxes.sort(axis=1)
+            children.append((new_boxes, target[rows].astype(cell_type), rows,
+                             np.full(len(rows), code, dtype=np.int8)))
+        if timing: t = profiler.lap('move', t)
+
+        new_boxes = np.concatenate([child[0] for child in children])
+        new_player = np.concatenate([child[1] for child in children])
+        parent = np.concatenate([child[2] for child in children])
+        move = np.concatenate([child[3] for child in children])
+
+        # duplicates inside the layer, then states seen in earlier layers
+        keys, first = np.unique(layer_keys(new_boxes, new_player), return_index=True)
+        position = np.searchsorted(visited, keys)
+        seen = visited[np.minimum(position, len(visited) - 1)] == keys
+        fresh = ~seen
+        revisited_node += len(new_player) - int(fresh.sum())
+        visited = np.insert(visited, position[fresh], keys[fresh])
+        keep = np.sort(first[fresh])  # generation order, as BrFS
+        boxes = new_boxes[keep]
+        player = new_player[keep]
+        layers.append((parent[keep].astype(np.int32), move[keep]))
+        if timing: t = profiler.lap('visited', t)
+
+        won = np.nonzero(is_goal[boxes].sum(axis=1) == goal_count)[0]
+        if len(won):
+            solution = int(won[0])
+
+        else:
+            # f = depth of the layer just built
+            stop_reason = profiler.checkpoint(expand_node, generated_node, len(player), len(layers))
+
+    stats = profiler.finish()
+    path = []
+    if solution is not None:
+        row = solution
+        for parent, move in reversed(layers):
+            path.append(direction[move[row]])
+            row = parent[row]
+        path.reverse()
+    result = {
+        'is_solved': solution is not None,
+        'path': path,
+        'expand_node': expand_node,
+        'generated_node': generated_node,
+        'revisited_node': revisited_node,
+        **stats
+    }
+    if stop_reason is not None:
+        result['stop_reason'] = stop_reason
+    return result
+
+def A_star(init_state, goal, push_level=False, h_cache_size=None, progress=None, budget=None, cancel=None,
+           macros=False, patterns=False):
     """
     Implement A* algorithm with Hungarian Algorithm heuristic
-    
+
     Args:
         result: dict to store results
         init_state: State object with initial game state
         goal: list of goal positions
+        push_level: search over box pushes instead of single steps,
+            g(n) then counts pushes
+        h_cache_size: number of box configurations kept in the heuristic
+            cache (default heuristic_cache_size), see HeuristicCache
+        progress, budget, cancel: see SearchProfiler; a search stopped by
+            the budget or the cancel token returns 'stop_reason' and, as
+            partial result, the path to the expanded state closest to the
+            goal (lowest h) in 'partial_path'
+        macros: tunnel and goal room macro pushes (push_level only), g(n)
+            still counts single pushes
+        patterns: h is the largest of the Hungarian assignment and the
+            pattern database bound (see PatternDatabase), built on first use
     """
+    profiler = SearchProfiler(progress=progress, budget=budget, cancel=cancel)
+    profiler.start()
+    timing = profiler.timing
+    start_state = init_state
+    if push_level:
+        init_state = init_state.normalized()
+    if macros:
+        init_state.level.prepare_macros()
+    if patterns:
+        init_state.level.prepare_patterns()
     generated_node = 0
     expand_node = 0
     revisited_node = 0
-    start_time = time.time()
+    solution = None
+    stop_reason = None
+    closest, closest_h = 0, None
 
-    # Priority queue: (f_cost, counter, state)
-    counter = 0
-    heap = []
-    heapq.heappush(heap, (A_star_h(init_state, init_state, goal), counter, init_state))
-    
-    visited = {}
-    visited[init_state] = 0  # g_cost
-    
-    while heap:       
-        f_cost, _, current_state = heapq.heappop(heap)
+    h_cache = HeuristicCache(h_cache_size or heuristic_cache_size,
+                             init_state.level.patterns if patterns else None)
+
+    # visited states, packed, with their g_cost (see StateTable)
+    visited = StateTable(init_state.level)
+    visited.insert(init_state)
+
+    # Open list: buckets by f, lowest h first (see BucketQueue)
+    open_list = BucketQueue()
+    open_list.push(0, h_cache.value(init_state), 0)
+
+    while open_list:
+        current, h_cost, g_cost = open_list.pop()
+        if visited.g[current] != g_cost:
+            # stale entry: a better g was found after it was pushed
+            open_list.stale += 1
+            continue
         expand_node += 1
-        
+        f_cost = g_cost + h_cost
+        current_state = visited.state(current)
+
         # Check if goal state
         if current_state.is_win(goal):
-            end_time = time.time()
-            current, peak = tracemalloc.get_traced_memory()
-            tracemalloc.stop()
-            result = {
-                'is_solved': True,
-                'path': current_state.path,
-                'expand_node': expand_node,
-                'generated_node': generated_node,
-                'revisited_node': revisited_node,
-                'time_taken': end_time - start_time,
-                'memory_used': peak / (1024 * 1024)
-            }
-            return result
-        
-        # Get current g_cost
-        g_cost = visited[current_state]
-        
+            solution = current
+            break
+
+        if closest_h is None or h_cost < closest_h:
+            closest, closest_h = current, h_cost
+
+        if expand_node % instrument.check_interval == 0:
+            stop_reason = profiler.checkpoint(expand_node, generated_node, len(open_list), f_cost)
+            if stop_reason is not None:
+                break
+
         # Explore neighbors
-        for neighbor in current_state.explore_neighbors():
-            generated_node += 1
-            
-            # Skip deadlocks
-            if neighbor.is_deadlock():
-                continue
-            
-            # Calculate new g_cost (number of moves)
+        if timing: t = perf_counter()
+        neighbors = current_state.explore_pushes(macros) if push_level else current_state.explore_neighbors()
+        generated_node += len(neighbors)
+        if timing: t = profiler.lap('move', t)
+
+        # Skip deadlocks
+        neighbors = [neighbor for neighbor in neighbors if not neighbor.is_deadlock()]
+        if timing: t = profiler.lap('is_deadlock', t)
+
+        opened = []
+        for neighbor in neighbors:
+            # Calculate new g_cost (number of moves, pushes of a macro)
             new_g_cost = g_cost + 1
-            
+            if macros and isinstance(neighbor.last_move, tuple):
+                new_g_cost = g_cost + len(neighbor.last_move)
+
             # Check if already visited with better cost
-            if neighbor in visited:
+            entry, is_new = visited.insert(neighbor, current, new_g_cost)
+            if not is_new:
                 revisited_node += 1
-                if visited[neighbor] <= new_g_cost:
+                if visited.g[entry] <= new_g_cost:
                     continue
-            
-            # Update visited
-            visited[neighbor] = new_g_cost
-            
-            # Calculate h_cost using Hungarian Algorithm
-            h_cost = A_star_h(neighbor, init_state, goal)
-            
-            # f_cost = g_cost + h_cost
-            new_f_cost = new_g_cost + h_cost
-            
-            # Add to heap
+                visited.update(entry, neighbor, current, new_g_cost)
+            opened.append((neighbor, entry, new_g_cost))
+        if timing: t = profiler.lap('visited', t)
+
+        # Calculate h_cost using Hungarian Algorithm (cached)
+        h_costs = [h_cache.value(neighbor) for neighbor, _, _ in opened]
+        if timing: t = profiler.lap('heuristic', t)
+
+        for (_, entry, new_g_cost), h_cost in zip(opened, h_costs):
+            # h >= unreachable: no box-goal assignment exists, dead end
+            if h_cost < unreachable:
+                open_list.push(entry, h_cost, new_g_cost)
+
+    stats = profiler.finish()
+    if solution is None:
+        path = []
+    elif push_level:
+        path = expand_pushes(start_state, push_pairs(visited.move_codes(solution)))
+    else:
+        path = [direction[code] for code in visited.move_codes(solution)]
+    result = {
+        'is_solved': solution is not None,
+        'path': path,
+        'expand_node': expand_node,
+        'generated_node': generated_node,
+        'revisited_node': revisited_node,
+        **stats,
+        **h_cache.stats(),
+        'stale_entries': open_list.stale,
+        **visited.stats()
+    }
+    if stop_reason is not None:
+        result['stop_reason'] = stop_reason
+        codes = visited.move_codes(closest)
+        result['partial_path'] = (expand_pushes(start_state, push_pairs(codes)) if push_level
+                                  else [direction[code] for code in codes])
+        result['partial_h'] = closest_h
+    return result
+
+# ARA*: weights of the successive searches, the last one must be 1.0
+ara_weights = (5.0, 3.0, 2.0, 1.5, 1.2, 1.0)
+
+def ARA_star(init_state, goal, push_level=False, weights=None, progress=None, budget=None, cancel=None,
+             improved=None):
+    """
+    Anytime Repairing A*: weighted A* with f = g + w * h, w decreasing
+
+    The first search (w = weights[0]) finds a solution fast, every next one
+    reuses the g-values and open list of the previous one: states improved
+    after being expanded are kept aside (INCONS) and reopened with the next
+    weight instead of searching again from scratch. A search stops as soon
+    as no open state can beat the best solution, so with w = 1 the best
+    solution is optimal.
+
+    Args:
+        push_level: search over box pushes, g(n) then counts pushes
+        weights: decreasing weights, default ara_weights
+        progress, budget, cancel: see SearchProfiler; a search stopped by the
+            budget returns the best solution found so far with 'stop_reason'
+        improved: callable(event), called with weight, cost, expand_node and
+            time every time a better solution is found
+
+    Result has the usual keys plus 'ara_solutions' (weight -> cost and time
+    of each improvement) and 'ara_bound': the cost of the returned solution
+    is at most ara_bound times the optimum (None before the first search
+    with a solution completed).
+    """
+    profiler = SearchProfiler(progress=progress, budget=budget, cancel=cancel)
+    profiler.start()
+    weights = weights or ara_weights
+    start_state = init_state
+    if push_level:
+        init_state = init_state.normalized()
+    generated_node = 0
+    expand_node = 0
+    revisited_node = 0
+    stop_reason = None
+
+    h_cache = HeuristicCache(heuristic_cache_size)
+    best = {init_state: (0, init_state)}  # state -> (g_cost, state object holding the parent chain)
+    incumbent, incumbent_cost = None, float('inf')
+    improvements = {}
+    bound = None
+
+    counter = 0
+    heap = [(weights[0] * h_cache.value(init_state), counter, init_state, 0)]
+    in_open = {init_state}
+    closed = set()
+    incons = set()
+    if init_state.is_win(goal):
+        incumbent, incumbent_cost, heap = init_state, 0, []
+
+    for weight in weights:
+        # improve path with this weight
+        while heap and stop_reason is None:
+            f_cost, _, state, g_cost = heap[0]
+            if state in closed or best[state][0] != g_cost:
+                heapq.heappop(heap)  # stale entry
+                continue
+            if incumbent_cost <= f_cost:
+                break
+            heapq.heappop(heap)
+            in_open.discard(state)
+            closed.add(state)
+            expand_node += 1
+            if expand_node % instrument.check_interval == 0:
+                stop_reason = profiler.checkpoint(expand_node, generated_node, len(heap), f_cost)
+
+            current_state = best[state][1]
+            neighbors = current_state.explore_pushes() if push_level else current_state.explore_neighbors()
+            generated_node += len(neighbors)
+            new_g_cost = g_cost + 1
+            for neighbor in neighbors:
+                if neighbor.is_deadlock():
+                    continue
+                if neighbor in best:
+                    revisited_node += 1
+                    if best[neighbor][0] <= new_g_cost:
+                        continue
+                best[neighbor] = (new_g_cost, neighbor)
+                if neighbor.is_win(goal):
+                    # goal states are not expanded, only kept as incumbent
+                    if new_g_cost < incumbent_cost:
+                        incumbent, incumbent_cost = neighbor, new_g_cost
+                        elapsed = time.time() - profiler.start_time
+                        improvements[f"w = {weight:g}"] = f"{new_g_cost} ({elapsed:.3f}s)"
+                        if improved is not None:
+                            improved({'weight': weight, 'cost': new_g_cost, 'expand_node': expand_node,
+                                      'time': elapsed})
+                    continue
+                if neighbor in closed:
+                    incons.add(neighbor)
+                else:
+                    counter += 1
+                    heapq.heappush(heap, (new_g_cost + weight * h_cache.value(neighbor), counter,
+                                          neighbor, new_g_cost))
+                    in_open.add(neighbor)
+
+        if stop_reason is not None:
+            break
+        # no open state can beat the incumbent by more than the weight (or
+        # than the ratio to the lowest g + h left, if smaller)
+        pending = in_open | incons
+        if not pending or weight == weights[-1]:
+            bound = 1.0 if incumbent is not None else None
+            break
+        lowest = min(best[s][0] + h_cache.value(s) for s in pending)
+        bound = min(weight, incumbent_cost / lowest) if lowest > 0 else weight
+        if bound <= 1.0:
+            bound = 1.0
+            break
+        # next weight: reopen the open and inconsistent states with new keys
+        next_weight = weights[weights.index(weight) + 1]
+        in_open = pending
+        incons = set()
+        closed = set()
+        heap = []
+        for s in in_open:
             counter += 1
-            heapq.heappush(heap, (new_f_cost, counter, neighbor))
-    
-    # No solution found
-    end_time = time.time()
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+            g_cost = best[s][0]
+            heap.append((g_cost + next_weight * h_cache.value(s), counter, s, g_cost))
+        heapq.heapify(heap)
+
+    stats = profiler.finish()
+    if incumbent is None:
+        path = []
+    elif push_level:
+        path = expand_pushes(start_state, incumbent.pushes())
+    else:
+        path = incumbent.path
+    result = {
+        'is_solved': incumbent is not None,
+        'path': path,
+        'expand_node': expand_node,
+        'generated_node': generated_node,
+        'revisited_node': revisited_node,
+        **stats,
+        **h_cache.stats(),
+        'ara_solutions': improvements,
+        'ara_bound': bound
+    }
+    if stop_reason is not None:
+        result['stop_reason'] = stop_reason
+    return result
+
+def BiBrFS(init_state, goal):
+    """
+    Bidirectional BrFS over box pushes
+
+    Forward search pushes boxes from init_state, backward search pulls them
+    from the solved configuration, starting once with the player in each
+    region the goal boxes leave. States on both sides are push-level
+    (normalized player), so the search stops as soon as a state is seen by
+    both sides and the two halves are joined. The solution is not
+    guaranteed to be optimal.
+
+    Args:
+        init_state: State object with initial game state
+        goal: list of goal positions
+    """
+    profiler = SearchProfiler()
+    profiler.start()
+    generated_node = 0
+    expand_node = 0
+    revisited_node = 0
+
+    level = init_state.level
+    start = init_state.normalized()
+
+    def finish(is_solved, pushes):
+        stats = profiler.finish()
+        return {
+            'is_solved': is_solved,
+            'path': expand_pushes(init_state, pushes) if is_solved else [],
+            'expand_node': expand_node,
+            'generated_node': generated_node,
+            'revisited_node': revisited_node,
+            **stats
+        }
+
+    if start.is_win():
+        return finish(True, [])
+    if len(level.goal_cells) != len(start.boxes):
+        # backward search needs the exact solved configuration
+        profiler.finish()
+        return BrFS(init_state, goal, push_level=True)
+
+    # backward roots: goal configuration, one per player region
+    goal_boxes = level.goal_cells
+    floor = reachable_cells(level, init_state.player, ())
+    backward_roots = []
+    seen = set(goal_boxes)
+    for c in sorted(floor):
+        if c in seen:
+            continue
+        region = reachable_cells(level, c, goal_boxes)
+        seen |= region
+        backward_roots.append(SokobanState(level, goal_boxes, min(region)))
+
+    forward_visited = {start: start}
+    backward_visited = {state: state for state in backward_roots}
+    forward_queue = deque([start])
+    backward_queue = deque(backward_roots)
+
+    def joined(forward_state, backward_state):
+        # forward pushes up to the meeting state, then the backward chain
+        # (its last_move codes are already forward pushes, in order)
+        pushes = forward_state.pushes()
+        state = backward_state
+        while state.parent is not None:
+            pushes.append((state.last_move >> 2, direction[state.last_move & 3]))
+            state = state.parent
+        return pushes
+
+    if start in backward_visited:
+        return finish(True, joined(start, backward_visited[start]))
+
+    while forward_queue and backward_queue:
+        # expand one whole layer of the smaller frontier
+        forward = len(forward_queue) <= len(backward_queue)
+        queue = forward_queue if forward else backward_queue
+        visited = forward_visited if forward else backward_visited
+        other = backward_visited if forward else forward_visited
+        for _ in range(len(queue)):
+            current_state = queue.popleft()
+            expand_node += 1
+            if expand_node % instrument.check_interval == 0:
+                profiler.sample()
+            explored = current_state.explore_pushes() if forward else current_state.explore_pulls()
+            for state in explored:
+                generated_node += 1
+                if forward and state.is_deadlock():
+                    continue
+
+                if state in visited:
+                    revisited_node += 1
+                    continue
+
+                if state in other:
+                    if forward:
+                        return finish(True, joined(state, other[state]))
+                    return finish(True, joined(other[state], state))
+
+                queue.append(state)
+                visited[state] = state
+
+    # no solution
+    return finish(False, [])
+
+# slots in the IDA_star transposition table (and its heuristic cache)
+ida_table_size = 1 << 16
+
+def IDA_star(init_state, goal, push_level=False, table_size=None):
+    """
+    Iterative deepening A* with the A_star heuristic and deadlock checks
+
+    Depth-first search bounded by f = g + h, the bound growing to the
+    smallest f that exceeded it until a solution is found. Only the current
+    path and its siblings are kept, so memory grows with the search depth,
+    plus a fixed-size transposition table that prunes states reached again
+    in the same iteration with no better g.
+
+    Args:
+        init_state: State object with initial game state
+        goal: list of goal positions
+        push_level: search over box pushes instead of single steps
+        table_size: slots in the transposition table (default
+            ida_table_size), 0 disables it
+    """
+    profiler = SearchProfiler()
+    profiler.start()
+    start_state = init_state
+    if push_level:
+        init_state = init_state.normalized()
+    generated_node = 0
+    expand_node = 0
+    revisited_node = 0
+
+    if table_size is None:
+        table_size = ida_table_size
+    # direct-mapped: slot -> (iteration, player, boxes, g)
+    table = [None] * table_size
+    h_cache = HeuristicCache(max(table_size, 1024))
+
+    def children(state):
+        nonlocal generated_node
+        neighbors = state.explore_pushes() if push_level else state.explore_neighbors()
+        generated_node += len(neighbors)
+        # drop deadlocks before sorting: no heuristic computed for them
+        neighbors = [neighbor for neighbor in neighbors if not neighbor.is_deadlock()]
+        # most promising first, only matters in the last iteration
+        neighbors.sort(key=h_cache.value)
+        return iter(neighbors)
+
+    solution = init_state if init_state.is_win() else None
+    bound = h_cache.value(init_state)
+    iteration = 0
+    while solution is None and bound < unreachable:
+        iteration += 1
+        next_bound = unreachable
+        expand_node += 1
+        stack = [(init_state, 0, children(init_state))]
+        on_path = {init_state}
+        while stack:
+            state, g_cost, neighbors = stack[-1]
+            neighbor = next(neighbors, None)
+            if neighbor is None:
+                stack.pop()
+                on_path.discard(state)
+                continue
+            # Skip cycles on the current path
+            if neighbor in on_path:
+                revisited_node += 1
+                continue
+
+            new_g_cost = g_cost + 1
+            if table_size:
+                slot = hash(neighbor) % table_size
+                entry = table[slot]
+                if (entry is not None and entry[0] == iteration and entry[1] == neighbor.player
+                        and entry[2] == neighbor.boxes and entry[3] <= new_g_cost):
+                    revisited_node += 1
+                    continue
+                table[slot] = (iteration, neighbor.player, neighbor.boxes, new_g_cost)
+
+            new_f_cost = new_g_cost + h_cache.value(neighbor)
+            if new_f_cost > bound:
+                next_bound = min(next_bound, new_f_cost)
+                continue
+
+            if neighbor.is_win():
+                solution = neighbor
+                break
+
+            expand_node += 1
+            if expand_node % instrument.check_interval == 0:
+                profiler.sample()
+            on_path.add(neighbor)
+            stack.append((neighbor, new_g_cost, children(neighbor)))
+        bound = next_bound
+
+    stats = profiler.finish()
+    if solution is None:
+        path = []
+    elif push_level:
+        path = expand_pushes(start_state, solution.pushes())
+    else:
+        path = solution.path
     result = {
-        'is_solved': False,
-        'path': [],
+        'is_solved': solution is not None,
+        'path': path,
         'expand_node': expand_node,
         'generated_node': generated_node,
         'revisited_node': revisited_node,
+        **stats,
+        'ida_iterations': iteration,
+        **h_cache.stats()
+    }
+    return result
+
+# HDA*: successors sent to another worker are batched per destination, an
+# outbox is sent when it holds hda_batch_size states or when the worker finds
+# its inbox empty; a busy worker reads its inbox every hda_poll_interval
+# expansions
+hda_batch_size = 64
+hda_poll_interval = 32
+
+# seconds a worker waits for a message before checking that HDA_star is
+# still alive (its parent process id changes when it dies)
+hda_wait = 1.0
+
+def hda_worker(index, level, init_boxes, init_player, inboxes, results, shared):
+    # one HDA_star worker: owns the states whose hash % workers == index,
+    # keeps their open list and g-costs, and sends successors to their owner
+    # every state it owns gets a local id; the path is kept as (worker, id)
+    # of the parent and the move from it, traced back at the end
+    profiler = SearchProfiler(timing=False)
+    profiler.start()
+    parent = os.getppid()
+    workers = len(inboxes)
+    inbox = inboxes[index]
+    lock, outstanding, idle, incumbent, done = shared
+    generated_node = 0
+    expand_node = 0
+    revisited_node = 0
+    best = None  # (g, id) of the best solution this worker found
+
+    h_cache = HeuristicCache(heuristic_cache_size)
+    heap = []
+    visited = {}  # (player, boxes) -> id
+    g = array('i')
+    parent_worker = array('i')
+    parent_id = array('i')
+    move = array('b')
+    outboxes = [[] for _ in range(workers)]
+    counter = 0
+
+    def receive(player, boxes, box_hash, g_cost, from_worker, from_id, code):
+        # insert a state owned by this worker
+        nonlocal counter, revisited_node
+        key = (player, boxes)
+        node = visited.get(key)
+        if node is not None:
+            revisited_node += 1
+            if g[node] <= g_cost:
+                return
+            g[node] = g_cost
+            parent_worker[node] = from_worker
+            parent_id[node] = from_id
+            move[node] = code
+        else:
+            node = visited[key] = len(g)
+            g.append(g_cost)
+            parent_worker.append(from_worker)
+            parent_id.append(from_id)
+            move.append(code)
+        state = SokobanState(level, boxes, player, box_hash)
+        counter += 1
+        heapq.heappush(heap, (g_cost + h_cache.value(state), counter, state, g_cost, node))
+
+    def send(owner):
+        with lock:
+            outstanding.value += 1
+        inboxes[owner].put(outboxes[owner])
+        outboxes[owner] = []
+
+    def flush():
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                send(owner)
+
+    init_state = SokobanState(level, init_boxes, init_player)
+    if hash(init_state) % workers == index:
+        receive(init_player, init_boxes, init_state.box_hash, 0, -1, -1, -1)
+
+    while not done.value:
+        # take everything sent to us
+        while expand_node % hda_poll_interval == 0:
+            try:
+                batch = inbox.get_nowait()
+            except queue.Empty:
+                # nothing to read: don't keep the others waiting either
+                flush()
+                break
+            for message in batch:
+                receive(*message)
+            with lock:
+                idle[index] = 0
+                outstanding.value -= 1
+
+        if not heap or heap[0][0] >= incumbent.value:
+            # nothing left below the incumbent: done once everybody is idle
+            # and no batch is in flight
+            flush()
+            with lock:
+                idle[index] = 1
+                if outstanding.value == 0 and all(idle):
+                    done.value = 1
+            try:
+                batch = inbox.get(timeout=0.01)
+            except queue.Empty:
+                if os.getppid() != parent:
+                    return  # HDA_star is gone, nobody waits for us
+                continue
+            for message in batch:
+                receive(*message)
+            with lock:
+                idle[index] = 0
+                outstanding.value -= 1
+            continue
+
+        f_cost, _, state, g_cost, node = heapq.heappop(heap)
+        if g[node] < g_cost:
+            continue  # stale entry, a better g was found later
+        expand_node += 1
+        if expand_node % instrument.check_interval == 0:
+            profiler.sample()
+            if os.getppid() != parent:
+                return  # HDA_star is gone, nobody waits for us
+
+        if state.is_win():
+            with lock:
+                if g_cost < incumbent.value:
+                    incumbent.value = g_cost
+                    best = (g_cost, node)
+            continue
+
+        for neighbor in state.explore_neighbors():
+            generated_node += 1
+            if neighbor.is_deadlock():
+                continue
+            new_g_cost = g_cost + 1
+            if new_g_cost + h_cache.value(neighbor) >= incumbent.value:
+                continue
+            message = (neighbor.player, neighbor.boxes, neighbor.box_hash, new_g_cost,
+                       index, node, neighbor.last_move)
+            owner = hash(neighbor) % workers
+            if owner == index:
+                receive(*message)
+            else:
+                outboxes[owner].append(message)
+                if len(outboxes[owner]) >= hda_batch_size:
+                    send(owner)
+
+    results.put({
+        'index': index,
+        'best': best,
+        'expand_node': expand_node,
+        'generated_node': generated_node,
+        'revisited_node': revisited_node,
+        'memory_used': profiler.finish()['memory_used']
+    })
+
+    # path requests: walk the parents owned by this worker, reply with the
+    # moves found (last first) and where the walk goes on; None stops
+    while True:
+        try:
+            node = inbox.get(timeout=hda_wait)
+        except queue.Empty:
+            if os.getppid() != parent:
+                break
+            continue
+        if node is None:
+            break
+        codes = []
+        while parent_worker[node] == index:
+            codes.append(move[node])
+            node = parent_id[node]
+        if parent_worker[node] >= 0:
+            codes.append(move[node])
+        results.put((codes, parent_worker[node], parent_id[node]))
+
+def HDA_star(init_state, goal, workers=None):
+    """
+    Hash-distributed A* over several worker processes
+
+    Every state is owned by worker hash(state) % workers (Zobrist hash, the
+    same in every process). A worker expands the best states it owns and
+    sends each successor to its owner, batched per destination. A solution
+    becomes the incumbent; workers go on until no state below it is left
+    anywhere and no batch is in flight, so the path has the same length as
+    the sequential A_star one. A message carries the sender and local id of
+    the parent instead of the path; the solution is traced back through the
+    workers at the end.
+
+    Args:
+        init_state: State object with initial game state
+        goal: list of goal positions
+        workers: worker processes (default: number of cores)
+    """
+    start_time = time.time()
+    workers = workers or os.cpu_count() or 1
+
+    lock = mp.Lock()
+    shared = (
+        lock,
+        mp.Value('q', 0, lock=False),            # batches sent, not yet received
+        mp.Array('b', workers, lock=False),       # idle flag per worker
+        mp.Value('q', unreachable, lock=False),   # incumbent solution cost
+        mp.Value('b', 0, lock=False)              # termination flag
+    )
+    inboxes = [mp.Queue() for _ in range(workers)]
+    results = mp.Queue()
+    processes = [
+        mp.Process(target=hda_worker, daemon=True,
+                   args=(i, init_state.level, init_state.boxes, init_state.player, inboxes, results, shared))
+        for i in range(workers)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+
+        # trace the best solution back through the workers owning its states
+        solutions = [(report['best'], report['index']) for report in reports if report['best'] is not None]
+        codes = []
+        if solutions:
+            (_, node), worker = min(solutions)
+            while worker >= 0:
+                inboxes[worker].put(node)
+                segment, worker, node = results.get()
+                codes.extend(segment)
+            codes.reverse()
+        for inbox in inboxes:
+            inbox.put(None)
+        for process in processes:
+            process.join(timeout=hda_wait)
+    finally:
+        # interrupted or a worker stuck: don't leave them running
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            if process.pid is not None:
+                process.join()
+    end_time = time.time()
+
+    path = [direction[code] for code in codes]
+    result = {
+        'is_solved': bool(solutions),
+        'path': path,
+        'expand_node': sum(report['expand_node'] for report in reports),
+        'generated_node': sum(report['generated_node'] for report in reports),
+        'revisited_node': sum(report['revisited_node'] for report in reports),
         'time_taken': end_time - start_time,
-        'memory_used': peak / (1024 * 1024)
+        'memory_used': sum(report['memory_used'] for report in reports),
+        'memory_measure': 'tracemalloc' if instrument.trace_memory else 'rss',
+        'hda_workers': workers
     }
     return result
 
+# engines raced by portfolio, any key of search_methods
+portfolio_engines = ['BrFS', 'A_star']
+
+def portfolio_worker(conn, method, level, boxes, player):
+    # run one portfolio engine and send its result back
+    init_state = SokobanState(level, boxes, player)
+    conn.send(search_methods[method](init_state, init_state.goal))
+    conn.close()
+
+def portfolio(init_state, goal, engines=None):
+    """
+    Race several search methods in separate processes
+
+    The first engine to return a solution wins and the others are
+    terminated at once. The result is the winner's, plus its name in
+    'portfolio_winner' and how long every engine ran in 'portfolio_times'.
+
+    Args:
+        init_state: State object with initial game state
+        goal: list of goal positions
+        engines: method names to race (default portfolio_engines)
+    """
+    start_time = time.time()
+    engines = engines or portfolio_engines
+    running = {}  # conn -> (method, process)
+    for method in engines:
+        parent_conn, child_conn = mp.Pipe(duplex=False)
+        process = mp.Process(target=portfolio_worker,
+                             args=(child_conn, method, init_state.level, init_state.boxes, init_state.player))
+        process.start()
+        child_conn.close()
+        running[parent_conn] = (method, process)
+
+    times = {}
+    winner = None
+    result = None
+    while running and winner is None:
+        for conn in wait(list(running)):
+            method, process = running.pop(conn)
+            try:
+                engine_result = conn.recv()
+            except EOFError:
+                engine_result = None  # engine crashed
+            process.join()
+            times[method] = time.time() - start_time
+            if engine_result is not None and result is None:
+                result = engine_result
+            if engine_result is not None and engine_result['is_solved']:
+                winner = method
+                result = engine_result
+                break
+
+    # cancel the engines still running
+    for conn, (method, process) in running.items():
+        process.terminate()
+        process.join()
+        times[method] = time.time() - start_time
+
+    if result is None:
+        result = {
+            'is_solved': False,
+            'path': [],
+            'expand_node': 0,
+            'generated_node': 0,
+            'revisited_node': 0,
+            'time_taken': time.time() - start_time,
+            'memory_used': 0
+        }
+    result = dict(result)
+    if winner is not None:
+        # wall time of the race, process start-up included
+        result['time_taken'] = times[winner]
+    result['portfolio_winner'] = winner or '-'
+    result['portfolio_times'] = {method: times[method] for method in engines}
+    return result
+
 def A_star_h(current_state, init_state, goal):
     """
     Calculate h(n) using Hungarian Algorithm for optimal box-goal assignment
@@ -480,34 +2113,309 @@ def A_star_h(current_state, init_state, goal):
     Args:
         current_state: State object with current boxes positions
         init_state: State object (not used, kept for signature compatibility)
-        goal: list of goal positions
+        goal: list of goal positions (not used, the level has its goals)
     
     Returns:
         int: heuristic value (optimal assignment cost)
     """
+    return hungarian_assignment(current_state)[0]
+
+def hungarian_assignment(current_state):
+    """
+    Optimal box-goal assignment on exact push distances
+
+    Returns:
+        (int, tuple): assignment cost and, for each box (in the order of
+        current_state.boxes), the index of its goal in level.goal_cells
+    """
     boxes = current_state.boxes
-    goals = goal
-    
-    # Find boxes not yet on goals
-    completed_boxes = set(boxes) & set(goals)
-    remaining_boxes = list(set(boxes) - completed_boxes)
-    remaining_goals = list(set(goals) - completed_boxes)
+    level = current_state.level
     
-    # If all boxes on goals, h = 0
-    if not remaining_boxes:
-        return 0
+    # If all goals are covered, h = 0 (boxes off goal have no goal, -1)
+    if current_state.is_win():
+        return 0, tuple(level.goal_cells.index(c) if level.is_goal[c] else -1 for c in boxes)
     
-    # Create cost matrix: Manhattan distances
-    cost_matrix = np.array([[
-        abs(box[0] - goal_pos[0]) + abs(box[1] - goal_pos[1])
-        for goal_pos in remaining_goals
-    ] for box in remaining_boxes])
+    # Cost matrix: exact push distance of each box to each goal
+    # (precomputed per level, walls only), rows = boxes, cols = goals
+    cost_matrix = level.push_distance[:, boxes].T
     
     # Solve assignment problem using Hungarian Algorithm
     row_indices, col_indices = linear_sum_assignment(cost_matrix)
     
     # Return sum of optimal assignment
-    return int(cost_matrix[row_indices, col_indices].sum())
+    assignment = [-1] * len(boxes)
+    for row, col in zip(row_indices, col_indices):
+        assignment[row] = int(col)
+    return int(cost_matrix[row_indices, col_indices].sum()), tuple(assignment)
+
+# default number of box configurations HeuristicCache keeps
+heuristic_cache_size = 200000
+
+class HeuristicCache:
+    """
+    LRU cache of hungarian_assignment keyed by the box configuration
+
+    Successors that only move the player share their parent's boxes, so
+    their value is a plain lookup. When exactly one box moved and the
+    parent is cached, the parent's assignment is reused: a push changes
+    the push distance of the moved box to any goal by at most one, so the
+    optimum can drop by at most one. If moving the box along the old
+    assignment already gives parent - 1, that is the new optimum and the
+    Hungarian solve is skipped.
+
+    patterns: PatternDatabase of the level, h is then the largest of the
+    assignment cost and the pattern bound
+    """
+    def __init__(self, max_size, patterns=None):
+        self.max_size = max_size
+        self.patterns = patterns
+        self.entries = OrderedDict()  # boxes -> (h, assignment, assignment cost)
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+        self.raised = 0
+
+    def value(self, state):
+        entries = self.entries
+        entry = entries.get(state.boxes)
+        if entry is not None:
+            self.hits += 1
+            entries.move_to_end(state.boxes)
+            return entry[0]
+        self.misses += 1
+        entry = self.incremental_entry(state)
+        if entry is None:
+            entry = hungarian_assignment(state)
+        else:
+            self.incremental += 1
+        h, assignment = entry
+        if self.patterns is not None:
+            bound = self.patterns.value(state.boxes)
+            if bound > h:
+                self.raised += 1
+                h = bound
+        entries[state.boxes] = (h, assignment, entry[0])
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+        return h
+
+    def incremental_entry(self, state):
+        parent = state.parent
+        if state.pushed is None or parent is None or isinstance(state.last_move, tuple):
+            # several pushes (macro): the optimum may drop by more than one
+            return None
+        parent_entry = self.entries.get(parent.boxes)
+        if parent_entry is None:
+            return None
+        _, parent_assignment, parent_h = parent_entry
+        new = state.pushed
+        old = next(c for c in parent.boxes if c not in state.boxes)
+        goal_of = dict(zip(parent.boxes, parent_assignment))
+        g = goal_of.pop(old)
+        if g < 0:
+            # box without a goal (more boxes than goals): it may now take
+            # another box's goal, solve again
+            return None
+        distance = state.level.push_distance[g]
+        if distance[new] != distance[old] - 1:
+            return None
+        goal_of[new] = g
+        return parent_h - 1, tuple(goal_of[c] for c in state.boxes)
+
+    def stats(self):
+        return {
+            'h_cache_hits': self.hits,
+            'h_cache_misses': self.misses,
+            'h_cache_incremental': self.incremental,
+            **({'h_pattern_raised': self.raised, **self.patterns.stats()}
+               if self.patterns is not None else {})
+        }
+
+# StateTable: slots of the open addressing table when a search starts, the
+# table doubles when more than state_table_load of them are used
+state_table_size = 1 << 16
+state_table_load = 0.5
+
+class StateTable:
+    """
+    Closed set of BrFS and A_star: states packed into flat arrays
+
+    Every state seen gets an entry number; entry i is its key (box cells then
+    the player cell, key_size cells of keys), its zobrist hash, the entry it
+    was reached from, the move code from there (see SokobanState.last_move)
+    and, for A_star, its g. Lookups go through an open addressing table
+    (linear probing) of entry numbers, keyed by the hash; keys are only
+    compared when the hashes match. A state costs a few dozen bytes instead
+    of a SokobanState, its boxes tuple and a set / dict slot, and the search
+    rebuilds the state of an entry when it expands it. Entries are numbered
+    in insertion order, so the entries of BrFS not expanded yet are its queue.
+    """
+    def __init__(self, level, size=None):
+        self.level = level
+        # a cell fits in 16 bits unless the level has more than 65535 cells
+        self.keys = array('H' if len(level.wall) < 1 << 16 else 'I')
+        self.key_size = 0  # set by the first insert, every state has as many boxes
+        self.zobrist_player = level.zobrist_player
+        self.hashes = array('q')
+        self.parent = array('i')
+        self.move = array('i')
+        self.g = array('i')
+        self.macro_moves = {}  # entry -> tuple of push codes (move is -1)
+        self.slots = array('i', [-1]) * (size or state_table_size)
+        self.mask = len(self.slots) - 1
+        self.limit = int(len(self.slots) * state_table_load)
+        self.resizes = 0
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def insert(self, state, parent=-1, g=0):
+        """
+        (entry, True) for a state not seen yet, added with parent and g;
+        (entry, False) if it is in the table already (left unchanged)
+        """
+        player = state.player
+        boxes = state.boxes
+        h = state.box_hash ^ self.zobrist_player[player]  # hash(state)
+        hashes = self.hashes
+        slots = self.slots
+        mask = self.mask
+        keys = self.keys
+        size = self.key_size
+        i = h & mask
+        entry = slots[i]
+        while entry >= 0:
+            if hashes[entry] == h:
+                end = entry * size + size - 1
+                if keys[end] == player and tuple(keys[end - size + 1:end]) == boxes:
+                    return entry, False
+            i = (i + 1) & mask
+            entry = slots[i]
+
+        entry = len(hashes)
+        if not entry:
+            self.key_size = len(boxes) + 1
+        slots[i] = entry
+        keys.extend(boxes)
+        keys.append(player)
+        hashes.append(h)
+        self.parent.append(parent)
+        move = state.last_move
+        if move.__class__ is tuple:
+            self.macro_moves[entry] = move
+            move = -1
+        self.move.append(-1 if move is None else move)
+        self.g.append(g)
+        if entry >= self.limit:
+            self.resize()
+        return entry, True
+
+    def update(self, entry, state, parent, g):
+        # entry reached again with a lower g: new parent and move
+        self.parent[entry] = parent
+        move = state.last_move
+        self.macro_moves.pop(entry, None)
+        if isinstance(move, tuple):
+            self.macro_moves[entry] = move
+            move = -1
+        self.move[entry] = move
+        self.g[entry] = g
+
+    def resize(self):
+        slots = array('i', [-1]) * (len(self.slots) * 2)
+        mask = len(slots) - 1
+        for entry, h in enumerate(self.hashes):
+            i = h & mask
+            while slots[i] >= 0:
+                i = (i + 1) & mask
+            slots[i] = entry
+        self.slots = slots
+        self.mask = mask
+        self.limit = int(len(slots) * state_table_load)
+        self.resizes += 1
+
+    def state(self, entry):
+        # SokobanState of entry, without parent (the path is in the table)
+        start = entry * self.key_size
+        end = start + self.key_size - 1
+        level = self.level
+        player = self.keys[end]
+        box_hash = self.hashes[entry] ^ level.zobrist_player[player]
+        return SokobanState(level, tuple(self.keys[start:end]), player, box_hash)
+
+    def move_codes(self, entry):
+        # move codes from the first entry to entry, see SokobanState.move_codes
+        codes = []
+        parent = self.parent
+        while parent[entry] >= 0:
+            move = self.move[entry]
+            codes.append(self.macro_moves[entry] if move < 0 else move)
+            entry = parent[entry]
+        codes.reverse()
+        return codes
+
+    def stats(self):
+        arrays = (self.keys, self.hashes, self.parent, self.move, self.g, self.slots)
+        return {
+            'table_entries': len(self.hashes),
+            'table_bytes': sum(a.itemsize * len(a) for a in arrays),
+            'table_resizes': self.resizes
+        }
+
+class BucketQueue:
+    """
+    Open list of A_star: StateTable entries by f = g + h, lowest h first on
+    equal f
+
+    f and h are small integers, so buckets[f][h] is a stack of entries (an
+    array of int, g is f - h) and push / pop are O(1) amortized: pop walks
+    min_f and min_h[f] up over empty buckets, a push below them moves them
+    back down. A better g for a queued entry pushes it again; the old copy
+    stays and is skipped by the caller when popped (counted in stale).
+    """
+    def __init__(self):
+        self.buckets = []  # f -> list indexed by h of array of entries
+        self.min_h = []    # f -> every bucket below min_h[f] is empty
+        self.min_f = 0
+        self.size = 0
+        self.stale = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, entry, h, g):
+        f = g + h
+        buckets = self.buckets
+        while len(buckets) <= f:
+            buckets.append([])
+            self.min_h.append(0)
+        row = buckets[f]
+        while len(row) <= h:
+            row.append(array('i'))
+        row[h].append(entry)
+        if h < self.min_h[f]:
+            self.min_h[f] = h
+        if not self.size or f < self.min_f:
+            self.min_f = f
+        self.size += 1
+
+    def pop(self):
+        # (entry, h, g) with the lowest f, then the lowest h
+        buckets = self.buckets
+        min_h = self.min_h
+        f = self.min_f
+        while True:
+            row = buckets[f]
+            h = min_h[f]
+            while h < len(row) and not row[h]:
+                h += 1
+            min_h[f] = h
+            if h < len(row):
+                break
+            f += 1
+        self.min_f = f
+        self.size -= 1
+        return row[h].pop(), h, f - h
 
 def A_star_g(current_state, init_state, goal):
     """
@@ -523,6 +2431,84 @@ def A_star_g(current_state, init_state, goal):
     """
     return len(current_state.path)
 
+def BrFS_push(init_state, goal, **options):
+    # BrFS over box pushes: optimal in number of pushes, not moves
+    return BrFS(init_state, goal, push_level=True, **options)
+
+def A_star_push(init_state, goal, **options):
+    # A* over box pushes: optimal in number of pushes, not moves
+    return A_star(init_state, goal, push_level=True, **options)
+
+def BrFS_macro(init_state, goal, **options):
+    # BrFS_push with tunnel and goal room macros
+    return BrFS(init_state, goal, push_level=True, macros=True, **options)
+
+def A_star_macro(init_state, goal, **options):
+    # A_star_push with tunnel and goal room macros
+    return A_star(init_state, goal, push_level=True, macros=True, **options)
+
+def A_star_pdb(init_state, goal, **options):
+    return A_star(init_state, goal, patterns=True, **options)
+
+def A_star_push_pdb(init_state, goal, **options):
+    return A_star(init_state, goal, push_level=True, patterns=True, **options)
+
+def ARA_star_push(init_state, goal, **options):
+    # ARA* over box pushes: the last solution is optimal in number of pushes
+    return ARA_star(init_state, goal, push_level=True, **options)
+
+def IDA_star_push(init_state, goal):
+    # IDA* over box pushes: optimal in number of pushes, not moves
+    return IDA_star(init_state, goal, push_level=True)
+
+# method name (solver.py <tc> <method>) -> search function(init_state, goal)
+search_methods = {
+    'BrFS': BrFS,
+    'A_star': A_star,
+    'BrFS_push': BrFS_push,
+    'A_star_push': A_star_push,
+    'BrFS_macro': BrFS_macro,
+    'A_star_macro': A_star_macro,
+    'BrFS_batch': BrFS_batch,
+    'A_star_pdb': A_star_pdb,
+    'A_star_push_pdb': A_star_push_pdb,
+    'ARA_star': ARA_star,
+    'ARA_star_push': ARA_star_push,
+    'BiBrFS': BiBrFS,
+    'IDA_star': IDA_star,
+    'IDA_star_push': IDA_star_push,
+    'HDA_star': HDA_star,
+    'portfolio': portfolio
+}
+
+# methods accepting the progress, budget and cancel keyword arguments
+budget_methods = {'BrFS', 'A_star', 'BrFS_push', 'A_star_push', 'BrFS_macro', 'A_star_macro',
+                  'BrFS_batch', 'A_star_pdb', 'A_star_push_pdb', 'ARA_star', 'ARA_star_push'}
+
+# anytime methods, also accepting the improved keyword argument
+anytime_methods = {'ARA_star', 'ARA_star_push'}
+
+# part of the solution cache key: bump when a search method changes the
+# paths it returns, so that older cached solutions are not served any more
+solver_version = 1
+
+# solved levels kept on disk across runs, see solution_cache.py
+solutions = SolutionCache()
+
+def format_progress(event):
+    # one line for a progress event (see SearchProfiler.checkpoint)
+    best_f = '-' if event['best_f'] is None else event['best_f']
+    return (f"{event['expand_node']:,} expanded, frontier {event['frontier']:,}, f = {best_f}, "
+            f"{event['nodes_per_sec']:,.0f} nodes/s, {event['time']:.1f}s, {event['memory']:.1f} MB")
+
+def print_progress(event):
+    print(format_progress(event), flush=True)
+
+def print_improved(event):
+    # better solution found by an anytime method
+    print(f"Lời giải tốt hơn: {event['cost']} (w = {event['weight']:g}, "
+          f"{event['expand_node']:,} expanded, {event['time']:.2f}s)", flush=True)
+
 def draw(map):
     # offset x for drawing multiple maps side by side
     # display map using pygame 
@@ -561,78 +2547,137 @@ def loadInfoFromMap(map):
                 walls.append((x,y))    
     return boxes, walls, player, goal
 
-# via UI pygame collect testcase, method 
-def solver(testcase, method, is_log=True, debug=True):
+def testcase_name(testcase):
+    # name of a testcase in log files: 12, or Microban-12 for "Microban.xsb:12"
+    if isinstance(testcase, str) and ':' in testcase:
+        filepath, _, number = testcase.rpartition(':')
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        return f"{name}-{number}".replace('_', '-')
+    return testcase
+
+def testcase_title(testcase):
+    # title of a collection level, "" for testcases/level*.txt
+    if isinstance(testcase, str) and ':' in testcase:
+        filepath, _, number = testcase.rpartition(':')
+        return open_collection(filepath).title(int(number))
+    return ""
+
+def solve_testcase(testcase, method, is_log=True, use_cache=False, **options):
+    # load testcase, run method and export the log when solved
+    # return (init_state, result), None if testcase or method doesn't exist
+    # use_cache: answer from the solution cache if the same map was already
+    # solved with the same method, result then has 'cached': True and no
+    # log is written (off by default: the logs hold the measured runs)
+    # options: progress, budget, cancel (methods in budget_methods only)
     init_map = load_testcase(testcase)
     if not init_map:
-        print(f"No testcase {tc_id}")
-        sys.exit(1)
+        print(f"No testcase {testcase}")
+        return None
     for row in init_map:
         print(row)
-    init_boxes, init_walls, init_player, init_goal = loadInfoFromMap(init_map)
-    init_state = SokobanState(init_map, init_boxes, init_walls, init_player, init_goal, [])
+    init_state = make_init_state(init_map)
+    init_goal = init_state.goal
 
-    if (method == 'BrFS'):
-        result = BrFS(init_state, init_goal)
-        if not result['is_solved']:
-            print("No Solution")
-            return None
+    if method not in search_methods:
+        print(f"Unknown method: {method} (available: {', '.join(search_methods)})")
+        return None
 
-        if (is_log):
-            # export file
-            stats = [
-                result['expand_node'],
-                result['generated_node'],
-                result['revisited_node'],
-                result['time_taken'],
-                result['memory_used']
-            ]
-            create_log(testcase, method, result['path'], result['is_solved'], stats, "")
-            print("export file")
-
-        if (debug):
-            # debug
-            print(result['path'])
-            replay_path(init_state, result['path'])
-            print(f"Time: {result['time_taken']}s")
-            print(f"Expanded Node: {result['expand_node']}")
-            print(f"Generated Node: {result['generated_node']}")
-            print(f"Revisited Node: {result['revisited_node']}")
-            print(f"Max memory usage: {result['memory_used']}MB")
-
-        return result['path']
-    
-    if (method == 'A_star'):
-        result = A_star(init_state, init_goal)
-        if not result['is_solved']:
-            print("No Solution")
-            return None
+    if use_cache:
+        key = level_key(init_map, method, solver_version)
+        result = solutions.get(key)
+        if result is not None:
+            print("Lời giải lấy từ cache")
+            result['cached'] = True
+            return init_state, result
 
-        if (is_log):
-            # export file
-            stats = [
-                result['expand_node'],
-                result['generated_node'],
-                result['revisited_node'],
-                result['time_taken'],
-                result['memory_used']
-            ]
-            create_log(testcase, method, result['path'], result['is_solved'], stats, "")
-            print("export file")
-
-        if (debug):
-            # debug
-            print(result['path'])
-            replay_path(init_state, result['path'])
-            print(f"Time: {result['time_taken']}s")
-            print(f"Expanded Node: {result['expand_node']}")
-            print(f"Generated Node: {result['generated_node']}")
-            print(f"Revisited Node: {result['revisited_node']}")
-            print(f"Max memory usage: {result['memory_used']}MB")
-
-        return result['path']
-
-def create_log(test_name, algorithm, path, is_solved, stats, level_info=""):
+    if options and method not in budget_methods:
+        print(f"{method} doesn't support progress/budget/cancel, running without")
+        options = {}
+
+    result = search_methods[method](init_state, init_goal, **options)
+    if use_cache and result['is_solved'] and 'stop_reason' not in result:
+        # an anytime method stopped early may have a better solution left
+        solutions.put(key, method, result)
+    if (is_log and result['is_solved']):
+        # export file
+        stats = [
+            result['expand_node'],
+            result['generated_node'],
+            result['revisited_node'],
+            result['time_taken'],
+            result['memory_used']
+        ]
+        extra = {key: result[key] for key in extra_stat_labels if key in result}
+        create_log(testcase_name(testcase), method, result['path'], result['is_solved'], stats,
+                   testcase_title(testcase), extra, result.get('memory_measure', 'tracemalloc'))
+        print("export file")
+
+    return init_state, result
+
+# via UI pygame collect testcase, method 
+def solver(testcase, method, is_log=True, debug=True, use_cache=False, **options):
+    solved = solve_testcase(testcase, method, is_log, use_cache, **options)
+    if solved is None:
+        if method in search_methods:
+            # no testcase
+            sys.exit(1)
+        return None
+
+    init_state, result = solved
+    if 'stop_reason' in result and not result['is_solved']:
+        print(f"Stopped ({result['stop_reason']}) after {result['expand_node']:,} expanded nodes")
+        return None
+    if not result['is_solved']:
+        print("No Solution")
+        return None
+
+    if (debug):
+        # debug
+        print(result['path'])
+        replay_path(init_state, result['path'])
+        print(f"Time: {result['time_taken']}s")
+        print(f"Expanded Node: {result['expand_node']}")
+        print(f"Generated Node: {result['generated_node']}")
+        print(f"Revisited Node: {result['revisited_node']}")
+        print(f"Max memory usage: {result['memory_used']}MB")
+
+    return result['path']
+
+# nhãn của các thống kê bổ sung trong result (nếu thuật toán có trả về)
+extra_stat_labels = {
+    'h_cache_hits': 'Heuristic cache hit',
+    'h_cache_misses': 'Heuristic cache miss',
+    'h_cache_incremental': 'Heuristic tính tăng dần (bỏ qua Hungarian)',
+    'ida_iterations': 'Số vòng lặp IDA*',
+    'hda_workers': 'Số tiến trình HDA*',
+    'portfolio_winner': 'Thuật toán thắng (portfolio)',
+    'portfolio_times': 'Thời gian chạy từng thuật toán (giây)',
+    'phase_times': 'Thời gian từng giai đoạn (giây)',
+    'phase_counts': 'Số lần gọi từng giai đoạn',
+    'peak_rss': 'RSS cao nhất (MB)',
+    'ara_solutions': 'Các lời giải ARA* (trọng số: chi phí, thời gian)',
+    'ara_bound': 'Chi phí tối đa so với tối ưu (ARA*, lần)',
+    'stop_reason': 'Dừng sớm',
+    'stale_entries': 'Entry cũ bỏ qua trong open list',
+    'table_entries': 'Trạng thái trong closed set',
+    'table_bytes': 'Bộ nhớ closed set (bytes)',
+    'table_resizes': 'Số lần mở rộng closed set',
+    'h_pattern_raised': 'Số lần pattern database tăng heuristic',
+    'pdb_build_time': 'Thời gian xây pattern database (giây)',
+    'pdb_size': 'Số thùng mỗi pattern',
+    'pdb_entries': 'Số pattern giải được',
+    'pdb_bytes': 'Bộ nhớ pattern database (bytes)'
+}
+
+def format_stat(value):
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, float):
+        return f"{value:.6f}"
+    return str(value)
+
+def create_log(test_name, algorithm, path, is_solved, stats, level_info="", extra=None,
+               memory_measure='tracemalloc'):
     """
     Tạo log chi tiết cho mỗi test case
     
@@ -642,6 +2687,8 @@ def create_log(test_name, algorithm, path, is_solved, stats, level_info=""):
         solution: Lời giải (list các action)
         stats: Thống kê performance
         level_info: Thông tin về level
+        extra: Thống kê bổ sung {key: value}, key trong extra_stat_labels
+        memory_measure: 'tracemalloc' hoặc 'rss' (RSS tăng thêm, ghi rõ trong log)
     """
     try:
         # Tạo thư mục logs nếu chưa có
@@ -677,8 +2724,17 @@ def create_log(test_name, algorithm, path, is_solved, stats, level_info=""):
             f.write(f"• Nodes đã mở rộng: {stats[0]:,}\n")
             f.write(f"• Nodes đã tạo: {stats[1]:,}\n") 
             f.write(f"• Nodes truy cập lại: {stats[2]:,}\n")
-            f.write(f"• Memory sử dụng: {stats[4]:.3f} MB\n")
+            memory_label = "Memory sử dụng (RSS)" if memory_measure == 'rss' else "Memory sử dụng"
+            f.write(f"• {memory_label}: {stats[4]:.3f} MB\n")
             f.write(f"• Thời gian thực hiện: {stats[3]:.6f} giây\n")
+            for key, value in (extra or {}).items():
+                label = extra_stat_labels.get(key, key)
+                if isinstance(value, dict):
+                    f.write(f"• {label}:\n")
+                    for name, item in value.items():
+                        f.write(f"    - {name}: {format_stat(item)}\n")
+                else:
+                    f.write(f"• {label}: {format_stat(value)}\n")
             
             # Hiệu suất
             if stats[0] > 0:
@@ -693,15 +2749,35 @@ def create_log(test_name, algorithm, path, is_solved, stats, level_info=""):
         print(f"Lỗi khi tạo log: {e}")
 
 if __name__ == "__main__":
-    
-    if len(sys.argv) < 3:
-        print("Usage: python solver.py <testcase_id> <method>")
-        sys.exit(1)
+    import argparse, signal, threading
+    parser = argparse.ArgumentParser(description="Solve one testcase")
+    parser.add_argument('testcase', help="level number, or <file>:<n> for level n of a .xsb/.sok collection")
+    parser.add_argument('method')
+    parser.add_argument('--profile', action='store_true', help="per-phase timing")
+    parser.add_argument('--tracemalloc', action='store_true', help="exact (slow) memory measurement")
+    parser.add_argument('--progress', action='store_true', help="print progress while searching")
+    parser.add_argument('--nodes', type=int, default=None, help="stop after this many expanded nodes")
+    parser.add_argument('--time', type=float, default=None, help="stop after this many seconds")
+    parser.add_argument('--memory', type=float, default=None, help="stop above this many MB")
+    parser.add_argument('--cache', action='store_true', help="reuse a cached solution, no search and no log")
+    args = parser.parse_args()
+    instrument.phase_timing = args.profile
+    instrument.trace_memory = args.tracemalloc
 
-    tc_id = int(sys.argv[1])
-    method = sys.argv[2]
+    tc_id = int(args.testcase) if args.testcase.isdigit() else args.testcase
+    method = args.method
     print(f"Running testcase {tc_id} using {method}")
 
-    solver(tc_id, method)
-        
-    pass
+    options = {}
+    if method in budget_methods:
+        # Ctrl+C stops the search cleanly instead of killing it
+        cancel = threading.Event()
+        signal.signal(signal.SIGINT, lambda signum, frame: cancel.set())
+        budget = {'nodes': args.nodes, 'time': args.time, 'memory': args.memory}
+        options = {'budget': budget, 'cancel': cancel}
+        if args.progress:
+            options['progress'] = print_progress
+        if method in anytime_methods:
+            options['improved'] = print_improved
+
+    solver(tc_id, method, use_cache=args.cache, **options)
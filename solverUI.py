@@ -1,4 +1,5 @@
 import pygame
+import threading
 from solver import *
 
 #some const
@@ -48,13 +49,24 @@ def replay_path_UI(init_state, path):
 
     print("Replay finished. final path: ", path)
 
+def progress_UI(event):
+    # show the search progress in the title bar
+    # closing the window stops the search (see SearchProfiler cancel)
+    pygame.display.set_caption(f"Sokoban Solver - {format_progress(event)}")
+    if pygame.event.get(pygame.QUIT):
+        cancel.set()
+
 if __name__ == "__main__":
     
+    # --no-cache: search again even if the level was solved before
+    use_cache = '--no-cache' not in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--no-cache']
     if len(sys.argv) < 3:
-        print("Usage: python solverUI.py <testcase_id> <method>")
+        print("Usage: python solverUI.py <testcase_id> <method> [--no-cache]")
         sys.exit(1)
 
-    tc_id = int(sys.argv[1])
+    # level number, or <file>:<n> for level n of a .xsb/.sok collection
+    tc_id = int(sys.argv[1]) if sys.argv[1].isdigit() else sys.argv[1]
     method = sys.argv[2]
     print(f"Running testcase {tc_id} using {method}")
 
@@ -71,8 +83,7 @@ if __name__ == "__main__":
         overhigh = 1080/height
     tile_size = min(tile_size, overhigh, overwide)
     
-    init_boxes, init_walls, init_player, init_goal = loadInfoFromMap(init_map)
-    init_state = SokobanState(init_map, init_boxes, init_walls, init_player, init_goal, [])
+    init_state = make_init_state(init_map)
 
     wall = pygame.transform.scale(pygame.image.load('assets/wall.bmp'), (tile_size, tile_size))
     tiles = pygame.transform.scale(pygame.image.load('assets/tiles.bmp'), (tile_size, tile_size))
@@ -87,7 +98,17 @@ if __name__ == "__main__":
     pygame.display.update()
 
     drawUI(init_map)
-    result = solver(tc_id, method)
+    cancel = threading.Event()
+    options = {}
+    if method in budget_methods:
+        instrument.progress_interval = 0.2
+        options = {'progress': progress_UI, 'cancel': cancel}
+    # a cached solution replays at once, see solution_cache.py
+    result = solver(tc_id, method, use_cache=use_cache, **options)
+    if cancel.is_set():
+        pygame.quit()
+        sys.exit(0)
+    pygame.display.set_caption("Sokoban Solver")
     replay_path_UI(init_state, result)
         
     event_list = pygame.event.get()
@@ -0,0 +1,5 @@
+import os, sys
+
+# the solver modules are flat scripts in the repo root, not a package:
+# make them importable when pytest is run as plain `pytest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
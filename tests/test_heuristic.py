@@ -0,0 +1,40 @@
+from collections import deque
+
+from solver import make_init_state, hungarian_assignment, HeuristicCache, A_star_h
+
+# 2 boxes, 1 goal: one box never needs a goal
+extra_boxes_map = [
+    "#######",
+    "#.....#",
+    "#.x.x.#",
+    "#..@..#",
+    "#.?...#",
+    "#######"
+]
+
+def test_win_with_more_boxes_than_goals():
+    init_state = make_init_state([
+        "######",
+        "#@+x.#",
+        "######"
+    ])
+    assert init_state.is_win()
+    assert A_star_h(init_state, init_state, init_state.goal) == 0
+    assert hungarian_assignment(init_state)[1] == (0, -1)
+
+def test_incremental_matches_full_assignment():
+    # every state reached is scored through the cache (incremental when the
+    # parent is cached) and must equal a full Hungarian solve
+    init_state = make_init_state(extra_boxes_map)
+    cache = HeuristicCache(100000)
+    cache.value(init_state)
+    queue = deque([init_state])
+    visited = {init_state}
+    while queue and len(visited) < 2000:
+        state = queue.popleft()
+        for neighbor in state.explore_neighbors():
+            if neighbor in visited:
+                continue
+            visited.add(neighbor)
+            queue.append(neighbor)
+            assert cache.value(neighbor) == hungarian_assignment(neighbor)[0]